@@ -0,0 +1,86 @@
+"""Admission control for uploads, budgeted in seconds of video.
+
+Queued and processing analyses count against ``ADMISSION_BUDGET_SECONDS``.
+Uploads beyond it get ``429`` with a ``Retry-After`` computed from recent
+per-stage throughput. The same throughput figures estimate when an
+accepted upload will complete.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.models import Analysis
+
+STAGES = ('extract', 'transcribe', 'nlp', 'nonverbal')
+# Processing seconds per video-second per stage, used until enough analyses
+# have completed to measure it
+DEFAULT_STAGE_COST = {'extract': 0.05, 'transcribe': 0.4, 'nlp': 0.05, 'nonverbal': 0.3}
+
+
+def in_flight_seconds():
+    return (Analysis.objects.filter(status__in=['pending', 'processing'])
+            .aggregate(total=Sum('duration_seconds'))['total'] or 0)
+
+
+def stage_costs():
+    """Per-stage cost from recently completed analyses, cached for a minute"""
+    costs = cache.get('admission-stage-costs')
+    if costs is not None:
+        return costs
+
+    recent = (Analysis.objects
+              .filter(status='completed', stage_timings__isnull=False, duration_seconds__gt=0)
+              .order_by('-completed_at')
+              .values_list('stage_timings', 'duration_seconds')[:settings.ADMISSION_THROUGHPUT_SAMPLE])
+    costs = dict(DEFAULT_STAGE_COST)
+    for stage in STAGES:
+        samples = [(timings[stage], duration) for timings, duration in recent if stage in timings]
+        total_duration = sum(duration for _, duration in samples)
+        if total_duration:
+            costs[stage] = sum(elapsed for elapsed, _ in samples) / total_duration
+    cache.set('admission-stage-costs', costs, 60)
+    return costs
+
+
+def _pools(costs):
+    """(stage costs, pool concurrency) for the two parallel branches"""
+    asr_cost = costs['extract'] + costs['transcribe']
+    return [
+        (asr_cost, settings.ASR_WORKER_CONCURRENCY),
+        (costs['nlp'], settings.NLP_WORKER_CONCURRENCY),
+        (costs['nonverbal'], settings.CV_WORKER_CONCURRENCY),
+    ]
+
+
+def drain_rate(costs):
+    """Video-seconds per wall-second the bottleneck pool can process"""
+    return min(concurrency / cost for cost, concurrency in _pools(costs) if cost > 0)
+
+
+def estimate_completion_seconds(duration, backlog_seconds):
+    """Time until a clip admitted now finishes, behind ``backlog_seconds`` of work"""
+    costs = stage_costs()
+    asr_path = ((backlog_seconds / settings.ASR_WORKER_CONCURRENCY + duration)
+                * (costs['extract'] + costs['transcribe'])
+                + duration * costs['nlp'])
+    cv_path = (backlog_seconds / settings.CV_WORKER_CONCURRENCY + duration) * costs['nonverbal']
+    return max(asr_path, cv_path)
+
+
+def admit(duration):
+    """Return (admitted, seconds) where seconds is the completion estimate
+    when admitted, or the suggested Retry-After when refused."""
+    duration = duration or 0
+    backlog = in_flight_seconds()
+    if backlog and backlog + duration > settings.ADMISSION_BUDGET_SECONDS:
+        excess = backlog + duration - settings.ADMISSION_BUDGET_SECONDS
+        retry_after = excess / drain_rate(stage_costs())
+        return False, int(min(600, max(5, retry_after)))
+    return True, estimate_completion_seconds(duration, backlog)
+
+
+def estimated_completion_time(seconds):
+    return timezone.now() + timedelta(seconds=seconds)
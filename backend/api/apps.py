@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Registers the Celery worker signal handlers and inspect command
+        from . import worker_bootstrap  # noqa: F401
+
+        # Stub model backends for load testing (see api/loadtest_stubs.py)
+        if settings.LOADTEST_STUBS:
+            from . import loadtest_stubs
+            loadtest_stubs.install()
@@ -0,0 +1,84 @@
+"""SLO-driven choice of whisper model per job.
+
+Larger whisper models are more accurate but slower. For each job we
+estimate when it would finish under the current backlog with every model
+and pick the most accurate one that still meets the target completion
+time, degrading to smaller models as the queue grows.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from core.models import Analysis
+
+
+def model_rank(model_name):
+    models = list(settings.ASR_MODEL_RTF)
+    return models.index(model_name) if model_name in models else -1
+
+
+def asr_backlog(exclude_id=None):
+    """Return (jobs, audio seconds) waiting for or in transcription"""
+    in_progress = Analysis.objects.filter(status='processing').exclude(checkpoints__stage='transcribe')
+    if exclude_id is not None:
+        in_progress = in_progress.exclude(id=exclude_id)
+    seconds = in_progress.aggregate(total=Sum('duration_seconds'))['total'] or 0
+    return in_progress.count(), seconds
+
+
+def estimate_completion(model_name, duration, backlog_seconds):
+    """Seconds until a job of ``duration`` would be transcribed with ``model_name``"""
+    rtf = settings.ASR_MODEL_RTF
+    # Jobs ahead of us run with the default model on the shared asr pool
+    wait = backlog_seconds * rtf[settings.ASR_DEFAULT_MODEL] / settings.ASR_WORKER_CONCURRENCY
+    return wait + duration * rtf[model_name]
+
+
+def choose_model(duration, backlog_seconds):
+    """Pick the most accurate model whose estimate meets the target"""
+    if duration is None:
+        return settings.ASR_DEFAULT_MODEL
+
+    candidates = list(settings.ASR_MODEL_RTF)[:model_rank(settings.ASR_MAX_MODEL) + 1]
+    for model_name in reversed(candidates):
+        if estimate_completion(model_name, duration, backlog_seconds) <= settings.ASR_TARGET_COMPLETION_SECONDS:
+            return model_name
+    return candidates[0]
+
+
+def select_model_for(analysis):
+    _, backlog_seconds = asr_backlog(exclude_id=analysis.id)
+    return choose_model(analysis.duration_seconds, backlog_seconds)
+
+
+def no_upgrade_in_flight():
+    """Filter for analyses without a queued or running upgrade (lost ones time out)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.ASR_UPGRADE_TIMEOUT_SECONDS)
+    return Q(asr_upgrade_started_at__isnull=True) | Q(asr_upgrade_started_at__lte=cutoff)
+
+
+def system_idle():
+    busy = Analysis.objects.filter(status__in=['pending', 'processing']).exists()
+    return not busy and not Analysis.objects.exclude(no_upgrade_in_flight()).exists()
+
+
+def upgrade_candidates(limit):
+    """Completed analyses transcribed below the best configured model, whose video is still stored"""
+    lower_models = [m for m in settings.ASR_MODEL_RTF
+                    if model_rank(m) < model_rank(settings.ASR_MAX_MODEL)]
+    return (Analysis.objects
+            .filter(no_upgrade_in_flight(), status='completed', asr_model__in=lower_models)
+            .exclude(media_state='deleted')
+            .order_by('completed_at')[:limit])
+
+
+def claim_upgrades(limit):
+    """Mark up to ``limit`` candidates as upgrading and return their ids"""
+    with transaction.atomic():
+        analysis_ids = list(upgrade_candidates(limit).select_for_update(skip_locked=True)
+                            .values_list('id', flat=True))
+        Analysis.objects.filter(id__in=analysis_ids).update(asr_upgrade_started_at=timezone.now())
+    return analysis_ids
@@ -0,0 +1,41 @@
+import os
+from core.models import StageCheckpoint
+
+
+def load_checkpoint(analysis_id, stage):
+    """Return the stored checkpoint for a stage, or None if it must be (re)run.
+
+    A checkpoint whose artifact file has disappeared is discarded, since the
+    downstream stages could not use it.
+    """
+    checkpoint = StageCheckpoint.objects.filter(analysis_id=analysis_id, stage=stage).first()
+    if checkpoint is None:
+        return None
+    if checkpoint.artifact_path and not os.path.exists(checkpoint.artifact_path):
+        checkpoint.delete()
+        return None
+    return checkpoint
+
+
+def save_checkpoint(analysis_id, stage, result=None, artifact_path='', elapsed_seconds=0):
+    checkpoint, _ = StageCheckpoint.objects.update_or_create(
+        analysis_id=analysis_id,
+        stage=stage,
+        defaults={
+            'result': result,
+            'artifact_path': artifact_path,
+            'elapsed_seconds': elapsed_seconds,
+        },
+    )
+    return checkpoint
+
+
+def clear_checkpoints(analysis_id):
+    """Delete all checkpoints and their artifacts, returning the stage timings"""
+    timings = {}
+    for checkpoint in StageCheckpoint.objects.filter(analysis_id=analysis_id):
+        timings[checkpoint.stage] = round(checkpoint.elapsed_seconds, 2)
+        if checkpoint.artifact_path and os.path.exists(checkpoint.artifact_path):
+            os.remove(checkpoint.artifact_path)
+        checkpoint.delete()
+    return timings
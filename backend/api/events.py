@@ -0,0 +1,125 @@
+"""Analysis status events over Redis pub/sub, streamed to clients as SSE.
+
+The pipeline publishes each transition (queued, processing, stage started,
+completed or retried, completed, failed) on ``analysis-events:<id>``. Each
+event carries a per-analysis sequence number and is also kept as the
+latest snapshot. A client that connects (or reconnects) mid-job first gets
+the current state, then the live events after it.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed')
+# Snapshots and sequence counters outlive any realistic job
+KEY_TTL_SECONDS = 24 * 3600
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _client
+
+
+def _channel(analysis_id):
+    return f'analysis-events:{analysis_id}'
+
+
+def _snapshot_key(analysis_id):
+    return f'analysis-status:{analysis_id}'
+
+
+def publish(analysis_id, status, event=None, stage=None, **extra):
+    """Publish a status event; failures are logged, never raised into the pipeline"""
+    payload = {
+        'analysis_id': analysis_id,
+        'status': status,
+        'event': event or status,
+        'stage': stage,
+        'at': timezone.now().isoformat(),
+        **extra,
+    }
+    try:
+        client = _redis()
+        payload['seq'] = client.incr(f'analysis-events-seq:{analysis_id}')
+        message = json.dumps(payload)
+        pipe = client.pipeline()
+        pipe.expire(f'analysis-events-seq:{analysis_id}', KEY_TTL_SECONDS)
+        pipe.set(_snapshot_key(analysis_id), message, ex=KEY_TTL_SECONDS)
+        pipe.publish(_channel(analysis_id), message)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not publish %s event for analysis %s', payload['event'], analysis_id, exc_info=True)
+    return payload
+
+
+@contextmanager
+def stage(analysis_id, name):
+    """Publish ``stage_started`` and, unless the block raises, ``stage_completed``"""
+    publish(analysis_id, 'processing', event='stage_started', stage=name)
+    yield
+    publish(analysis_id, 'processing', event='stage_completed', stage=name)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF accept ``Accept: text/event-stream``; only error bodies go through it"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+def _format(payload):
+    event_id = f"id: {payload['seq']}\n" if payload.get('seq') else ''
+    return f'{event_id}data: {json.dumps(payload)}\n\n'.encode()
+
+
+def stream(analysis):
+    """SSE byte chunks for one analysis until it finishes or the stream times out"""
+    client = _redis()
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    # Subscribe before reading the snapshot so nothing falls in between
+    pubsub.subscribe(_channel(analysis.id))
+    try:
+        yield f'retry: {settings.SSE_RETRY_MILLISECONDS}\n\n'.encode()
+
+        stored = client.get(_snapshot_key(analysis.id))
+        if stored:
+            snapshot = json.loads(stored)
+        else:
+            snapshot = {'analysis_id': analysis.id, 'status': analysis.status, 'event': analysis.status,
+                        'stage': None, 'seq': 0}
+        yield _format(snapshot)
+        if snapshot['status'] in TERMINAL_STATUSES:
+            return
+
+        last_seq = snapshot.get('seq') or 0
+        deadline = time.monotonic() + settings.SSE_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=settings.SSE_KEEPALIVE_SECONDS)
+            if message is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield b': keepalive\n\n'
+                continue
+            payload = json.loads(message['data'])
+            if payload.get('seq', 0) <= last_seq:
+                continue
+            last_seq = payload['seq']
+            yield _format(payload)
+            if payload['status'] in TERMINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
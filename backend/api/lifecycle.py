@@ -0,0 +1,196 @@
+"""Reclaim storage held by the uploads of completed analyses.
+
+Two policies, each off by default and usable together:
+
+- ``MEDIA_PROXY_AFTER_COMPLETION`` replaces the upload with a low-bitrate
+  H.264 proxy (``MEDIA_PROXY_HEIGHT`` lines, 16 kHz mono audio) that is
+  still playable and still good enough for the idle-time ASR upgrade,
+  since whisper resamples to 16 kHz mono anyway. Uploads that fail to
+  transcode are marked ``proxy_failed``, and those whose proxy would be no
+  smaller ``proxy_skipped``; both keep their original.
+- ``MEDIA_DELETE_AFTER_DAYS`` deletes the upload, original or proxy, that
+  many days after completion. Deleted analyses keep their results but are
+  no longer upgrade candidates.
+
+The ``apply_media_lifecycle`` beat task handles up to
+``MEDIA_LIFECYCLE_BATCH_SIZE`` analyses per policy per run, oldest first,
+found through the ``(status, completed_at)`` index. The database row is
+updated before the old file is removed, so a crash leaves at worst an
+orphaned file, never a row pointing at a missing one. That update only
+applies while no ASR upgrade is claimed for the analysis (see
+``asr_policy.claim_upgrades``), so a file is never removed under an upgrade
+that is decoding it; such analyses are skipped until a later run.
+"""
+import logging
+import os
+import subprocess
+from datetime import timedelta
+from pathlib import Path
+
+import redis
+from django.conf import settings
+from redis.exceptions import LockError
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from core.models import Analysis
+from . import response_cache
+from .asr_policy import no_upgrade_in_flight
+
+logger = logging.getLogger(__name__)
+
+
+def _delete_cutoff():
+    if not settings.MEDIA_DELETE_AFTER_DAYS:
+        return None
+    return timezone.now() - timedelta(days=settings.MEDIA_DELETE_AFTER_DAYS)
+
+
+def delete_candidates(limit):
+    cutoff = _delete_cutoff()
+    if cutoff is None:
+        return Analysis.objects.none()
+    return (Analysis.objects
+            .filter(no_upgrade_in_flight(), status='completed', completed_at__lte=cutoff)
+            .exclude(media_state='deleted')
+            .order_by('completed_at')[:limit])
+
+
+def proxy_candidates(limit):
+    if not settings.MEDIA_PROXY_AFTER_COMPLETION:
+        return Analysis.objects.none()
+    candidates = Analysis.objects.filter(no_upgrade_in_flight(), status='completed', completed_at__isnull=False,
+                                         media_state='original')
+    cutoff = _delete_cutoff()
+    if cutoff is not None:
+        # About to be deleted anyway
+        candidates = candidates.filter(completed_at__gt=cutoff)
+    return candidates.order_by('completed_at')[:limit]
+
+
+def _size(storage, name):
+    try:
+        return storage.size(name)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _transcode_timeout(duration):
+    return max(600, 4 * (duration or 0))
+
+
+def _transcode(source, target, duration):
+    cmd = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-y', '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale=-2:'min({settings.MEDIA_PROXY_HEIGHT},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(settings.MEDIA_PROXY_CRF),
+        '-c:a', 'aac', '-b:a', settings.MEDIA_PROXY_AUDIO_BITRATE, '-ac', '1', '-ar', '16000',
+        '-movflags', '+faststart', '-f', 'mp4', target,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True, timeout=_transcode_timeout(duration))
+
+
+def make_proxy(analysis):
+    """Replace the upload with a proxy, returning the bytes reclaimed.
+
+    Returns None when nothing was replaced: an upgrade claimed the upload,
+    or the proxy would not have been smaller.
+    """
+    storage = analysis.video.storage
+    original = analysis.video.name
+    original_bytes = _size(storage, original)
+    proxy_name = storage.get_available_name(f'{os.path.dirname(original)}/{Path(original).stem}-proxy.mp4')
+    proxy_path = storage.path(proxy_name)
+    partial = f'{proxy_path}.part'
+    try:
+        _transcode(storage.path(original), partial, analysis.duration_seconds)
+        proxy_bytes = os.path.getsize(partial)
+        if proxy_bytes >= original_bytes:
+            # Already as compact as a proxy: keep the upload and don't try again
+            Analysis.objects.filter(id=analysis.id).update(media_state='proxy_skipped')
+            return None
+        os.replace(partial, proxy_path)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+    reclaimed = original_bytes - proxy_bytes
+    updated = Analysis.objects.filter(no_upgrade_in_flight(), id=analysis.id).update(
+        video=proxy_name, media_state='proxy', media_bytes_reclaimed=F('media_bytes_reclaimed') + reclaimed)
+    if not updated:
+        storage.delete(proxy_name)
+        return None
+    storage.delete(original)
+    response_cache.invalidate(analysis.id)
+    return reclaimed
+
+
+def delete_media(analysis):
+    """Delete the upload, returning the bytes reclaimed, or None if an upgrade claimed it"""
+    storage = analysis.video.storage
+    name = analysis.video.name
+    reclaimed = _size(storage, name) if name else 0
+    updated = Analysis.objects.filter(no_upgrade_in_flight(), id=analysis.id).update(
+        video='', media_state='deleted', media_bytes_reclaimed=F('media_bytes_reclaimed') + reclaimed)
+    if not updated:
+        return None
+    if name:
+        storage.delete(name)
+    response_cache.invalidate(analysis.id)
+    return reclaimed
+
+
+def report():
+    """Analyses and cumulative bytes reclaimed per media state"""
+    rows = (Analysis.objects.filter(status='completed').values('media_state')
+            .annotate(analyses=Count('id'), bytes_reclaimed=Sum('media_bytes_reclaimed')))
+    return {row['media_state']: {'analyses': row['analyses'], 'bytes_reclaimed': row['bytes_reclaimed'] or 0}
+            for row in rows}
+
+
+def apply_policies():
+    """Run one batch of each enabled policy.
+
+    A Redis lock keeps a slow batch of transcodes from overlapping the next
+    beat run. It is renewed before each transcode for as long as that
+    transcode may take, so it can't expire in the middle of a batch.
+    """
+    client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    lock = client.lock('media-lifecycle', timeout=600)
+    if not lock.acquire(blocking=False):
+        return {'skipped': 'another lifecycle run is in progress'}
+    try:
+        limit = settings.MEDIA_LIFECYCLE_BATCH_SIZE
+        deleted, proxied, failed, skipped, reclaimed = [], [], [], [], 0
+        for analysis in delete_candidates(limit):
+            freed = delete_media(analysis)
+            (skipped if freed is None else deleted).append(analysis.id)
+            reclaimed += freed or 0
+        for analysis in proxy_candidates(limit):
+            try:
+                lock.extend(_transcode_timeout(analysis.duration_seconds) + 60, replace_ttl=True)
+            except LockError:
+                logger.warning('Media lifecycle lock was lost; stopping this batch')
+                break
+            try:
+                freed = make_proxy(analysis)
+                (skipped if freed is None else proxied).append(analysis.id)
+                reclaimed += freed or 0
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError):
+                logger.warning('Could not transcode a proxy for analysis %s', analysis.id, exc_info=True)
+                # Keep the original, and keep it out of later batches
+                Analysis.objects.filter(id=analysis.id).update(media_state='proxy_failed')
+                failed.append(analysis.id)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired meanwhile; nothing left to release
+            pass
+
+    if deleted or proxied:
+        logger.info('Media lifecycle: deleted %d, proxied %d, reclaimed %d bytes',
+                    len(deleted), len(proxied), reclaimed)
+    return {'deleted': deleted, 'proxied': proxied, 'failed': failed, 'skipped': skipped,
+            'bytes_reclaimed': reclaimed, 'totals': report()}
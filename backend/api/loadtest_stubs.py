@@ -0,0 +1,111 @@
+"""Stub analysis backends for load-testing the API and workers.
+
+With ``LOADTEST_STUBS`` set (e.g. ``transcribe=1.5,nlp=0.4``, or ``on`` for
+the defaults), ``install`` swaps preflight, audio extraction, whisper,
+``analyze_communication`` and ``analyze_video_nonverbal`` for stand-ins.
+The stand-ins sleep for the configured seconds and return results of the
+real shape. The web tier, scheduler, Celery canvas, admission control and
+caches all run unchanged, without ffmpeg, model weights or a JVM. It is
+installed from ``ApiConfig.ready``, so the web process and every worker must
+get the setting. Drive traffic with ``benchmarks/load_test.py``.
+"""
+import os
+import random
+import time
+
+from django.conf import settings
+
+DEFAULT_LATENCY = {'preflight': 0.02, 'extract': 0.2, 'transcribe': 1.0, 'nlp': 0.3, 'nonverbal': 0.5}
+STUB_VIDEO_SECONDS = 60.0
+STUB_TRANSCRIPT = (
+    'Thank you for having me today. I would like to walk you through our quarterly results. '
+    'Um, revenue grew by twelve percent, and uh, we expect the trend to continue next quarter. '
+    'Please let me know if you have any questions.'
+)
+
+
+def parse_latency(spec):
+    latency = dict(DEFAULT_LATENCY)
+    for item in spec.split(','):
+        stage, _, seconds = item.partition('=')
+        if stage in latency and seconds:
+            latency[stage] = float(seconds)
+    return latency
+
+
+def _wait(latency, stage):
+    if latency.get(stage, 0) > 0:
+        time.sleep(latency[stage] * random.uniform(0.8, 1.2))
+
+
+def install():
+    from . import tasks, views
+
+    latency = parse_latency(settings.LOADTEST_STUBS)
+
+    def preflight(path):
+        _wait(latency, 'preflight')
+        return {
+            'duration': STUB_VIDEO_SECONDS,
+            'format': 'mov,mp4,m4a,3gp,3g2,mj2',
+            'size_bytes': os.path.getsize(path),
+            'video': {'codec': 'h264', 'width': 1280, 'height': 720, 'fps': 30.0,
+                      'frames': int(STUB_VIDEO_SECONDS * 30)},
+            'audio': {'codec': 'aac', 'sample_rate': 44100, 'channels': 2},
+            'trimmed': False,
+            'analyze_seconds': STUB_VIDEO_SECONDS,
+        }
+
+    class StubClip:
+        def __init__(self, path):
+            self.audio = self
+
+        def subclipped(self, start, end):
+            return self
+
+        def write_audiofile(self, path, **kwargs):
+            _wait(latency, 'extract')
+            open(path, 'wb').close()
+
+        def close(self):
+            pass
+
+    class StubWhisper:
+        def eval(self):
+            return self
+
+        def parameters(self):
+            return []
+
+        def transcribe(self, path):
+            _wait(latency, 'transcribe')
+            return {'text': STUB_TRANSCRIPT, 'segments': []}
+
+    stub_whisper = StubWhisper()
+
+    def analyze_communication(transcript):
+        _wait(latency, 'nlp')
+        return {
+            'total_words': len(transcript.split()),
+            'grammar_errors': random.randint(0, 4),
+            'grammar_details': [],
+            'filler_count': random.randint(0, 5),
+            'repetitions': [],
+            'polite_count': random.randint(1, 4),
+            'impolite_count': 0,
+        }
+
+    def analyze_video_nonverbal(video_path, media_info=None):
+        _wait(latency, 'nonverbal')
+        return {
+            'eye_contact_percentage': round(random.uniform(40, 90), 2),
+            'hand_usage_percentage': 65,
+            'smile_percentage': 45,
+            'dominant_expression': 'neutral',
+        }
+
+    views.preflight = preflight
+    tasks.VideoFileClip = StubClip
+    tasks.get_whisper_model = lambda name='base': stub_whisper
+    tasks.analyze_communication = analyze_communication
+    tasks.analyze_video_nonverbal = analyze_video_nonverbal
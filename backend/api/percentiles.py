@@ -0,0 +1,180 @@
+"""Percentile rankings from mergeable quantile sketches.
+
+Each score dimension has a KLL sketch. The live sketches are kept in Redis
+and updated under a lock as analyses complete. They are copied to the
+``ScoreSketch`` table on a beat schedule, and rebuilt from there, or from
+the analyses table as a last resort, if Redis loses them. Lookups use a
+per-process copy refreshed every ``PERCENTILE_REFRESH_SECONDS``. They cost
+O(log k) and never scan analyses.
+"""
+import json
+import math
+import random
+import time
+from bisect import bisect_left, bisect_right
+
+import redis
+from django.conf import settings
+
+from core.models import Analysis, ScoreSketch
+
+SCORE_DIMENSIONS = ('grammar_score', 'fluency_score', 'politeness_score', 'body_language_score', 'overall_score')
+REDIS_KEY = 'score-sketches'
+
+_local = {'sketches': None, 'loaded_at': 0.0}
+
+
+class KLLSketch:
+    """KLL quantile sketch: bounded memory, mergeable, ~1% rank error at k=200"""
+
+    def __init__(self, k=200, compactors=None, n=0):
+        self.k = k
+        self.compactors = compactors or [[]]
+        self.n = n
+        self._cdf = None
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        while sum(len(c) for c in self.compactors) >= sum(self._capacity(h) for h in range(len(self.compactors))):
+            for h, items in enumerate(self.compactors):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                # An odd item out stays at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                self.compactors[h + 1].extend(items[random.getrandbits(1)::2])
+                self.compactors[h] = keep
+                break
+
+    def update(self, value):
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._cdf = None
+        self._compress()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        self._cdf = None
+        self._compress()
+
+    def _weighted(self):
+        if self._cdf is None:
+            pairs = sorted((v, 1 << h) for h, items in enumerate(self.compactors) for v in items)
+            values, cumulative, total = [], [], 0
+            for value, weight in pairs:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._cdf = (values, cumulative, total)
+        return self._cdf
+
+    def percentile(self, value):
+        """Share of values below ``value`` (ties count half), 0-100"""
+        values, cumulative, total = self._weighted()
+        if not total:
+            return None
+        lo = bisect_left(values, value)
+        hi = bisect_right(values, value)
+        below = cumulative[lo - 1] if lo else 0
+        at_or_below = cumulative[hi - 1] if hi else 0
+        return (below + at_or_below) / 2 / total * 100
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['k'], [list(c) for c in data['compactors']], data['n'])
+
+
+def _client():
+    return redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+
+def _read(client):
+    stored = client.hgetall(REDIS_KEY)
+    return {dim.decode(): KLLSketch.from_dict(json.loads(data)) for dim, data in stored.items()}
+
+
+def _write(client, sketches):
+    client.hset(REDIS_KEY, mapping={dim: json.dumps(sketch.to_dict()) for dim, sketch in sketches.items()})
+
+
+def _restore():
+    """Sketches from the last persisted copy, else one pass over completed analyses.
+
+    The flag tells whether they were rebuilt from the analyses table, and so
+    already include every completed analysis.
+    """
+    sketches = {row.dimension: KLLSketch.from_dict(row.data) for row in ScoreSketch.objects.all()}
+    if sketches:
+        return sketches, False
+
+    sketches = {dim: KLLSketch() for dim in SCORE_DIMENSIONS}
+    rows = Analysis.objects.filter(status='completed').values_list(*SCORE_DIMENSIONS)
+    for row in rows.iterator(chunk_size=2000):
+        for dim, value in zip(SCORE_DIMENSIONS, row):
+            if value is not None:
+                sketches[dim].update(value)
+    return sketches, True
+
+
+def load_sketches(client=None):
+    client = client or _client()
+    sketches = _read(client)
+    if not sketches:
+        with client.lock('score-sketches-lock', timeout=300, blocking_timeout=60):
+            sketches = _read(client)
+            if not sketches:
+                sketches, _ = _restore()
+                _write(client, sketches)
+    return sketches
+
+
+def record(scores):
+    """Add a saved, completed analysis's scores to the shared sketches"""
+    client = _client()
+    with client.lock('score-sketches-lock', timeout=300, blocking_timeout=10):
+        sketches = _read(client)
+        if not sketches:
+            sketches, includes_completed = _restore()
+            if includes_completed:
+                # The rebuild already counted this analysis
+                _write(client, sketches)
+                return
+        for dim in SCORE_DIMENSIONS:
+            if scores.get(dim) is not None:
+                sketches.setdefault(dim, KLLSketch()).update(scores[dim])
+        _write(client, sketches)
+
+
+def persist():
+    """Copy the live sketches to the database"""
+    sketches = _read(_client())
+    for dim, sketch in sketches.items():
+        ScoreSketch.objects.update_or_create(
+            dimension=dim, defaults={'data': sketch.to_dict(), 'count': sketch.n})
+    return {dim: sketch.n for dim, sketch in sketches.items()}
+
+
+def percentiles_for(analysis):
+    if _local['sketches'] is None or time.monotonic() - _local['loaded_at'] > settings.PERCENTILE_REFRESH_SECONDS:
+        _local['sketches'] = load_sketches()
+        _local['loaded_at'] = time.monotonic()
+
+    result = {}
+    for dim in SCORE_DIMENSIONS:
+        value = getattr(analysis, dim)
+        sketch = _local['sketches'].get(dim)
+        pct = sketch.percentile(value) if sketch is not None and value is not None else None
+        result[dim] = round(pct) if pct is not None else None
+    return result
@@ -0,0 +1,101 @@
+"""Opt-in stack-sampling profiles of analysis pipeline runs.
+
+An analysis is profiled when uploaded with ``X-Vocably-Profile: 1`` or
+picked by ``PROFILE_SAMPLE_RATE``. Each stage task samples its own thread
+while it runs and writes collapsed stacks (flamegraph.pl / speedscope
+format) rooted at the stage name to ``PROFILE_ROOT/analysis-<id>/``. The
+stages run on different workers, so the files are merged when read.
+"""
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from core.models import Analysis
+
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval"""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # ';' separates frames in the output
+            label = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self, root=None):
+        prefix = f'{root};' if root else ''
+        return ''.join(f'{prefix}{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+def should_profile(request):
+    header = request.headers.get('X-Vocably-Profile', '')
+    if header.strip().lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def _profile_dir(analysis_id):
+    return Path(settings.PROFILE_ROOT) / f'analysis-{analysis_id}'
+
+
+@contextmanager
+def stage(analysis_id, name):
+    """Sample the enclosed stage if the analysis asked to be profiled"""
+    if not Analysis.objects.filter(id=analysis_id, profile=True).exists():
+        yield
+        return
+
+    sampler = StackSampler(interval=settings.PROFILE_INTERVAL_SECONDS).start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        # A retried stage replaces the profile of its failed attempt
+        directory = _profile_dir(analysis_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f'{name}.folded').write_text(sampler.collapsed(name))
+
+
+def load_profile(analysis_id):
+    """All stage profiles of an analysis as one collapsed-stack text, or None"""
+    directory = _profile_dir(analysis_id)
+    if not directory.exists():
+        return None
+    parts = [path.read_text() for path in sorted(directory.glob('*.folded'))]
+    return ''.join(parts) or None
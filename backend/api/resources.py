@@ -0,0 +1,28 @@
+import os
+
+
+def available_cores():
+    return sorted(os.sched_getaffinity(0))
+
+
+def partition(cores, parts):
+    """Split cores into ``parts`` disjoint, near-equal slices (at least one core each)"""
+    parts = max(1, min(parts, len(cores)))
+    size, extra = divmod(len(cores), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def set_thread_budget(threads):
+    """Size the torch and OpenCV thread pools to the process's core budget"""
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
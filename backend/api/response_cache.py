@@ -0,0 +1,71 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def _key(analysis_id):
+    return f'analysis-response:{analysis_id}'
+
+
+def _media_final(analysis):
+    """The video URL changes while media lifecycle may still proxy or delete the upload"""
+    if analysis.media_state == 'deleted':
+        return True
+    if settings.MEDIA_DELETE_AFTER_DAYS:
+        return False
+    return analysis.media_state in ('proxy', 'proxy_failed', 'proxy_skipped') or not settings.MEDIA_PROXY_AFTER_COMPLETION
+
+
+def is_final(analysis):
+    """Completed results only change if the idle-time ASR upgrade or media lifecycle may rewrite them"""
+    return (analysis.status == 'completed'
+            and (not settings.ASR_UPGRADE_ENABLED or analysis.asr_model == settings.ASR_MAX_MODEL)
+            and _media_final(analysis))
+
+
+def get_entry(analysis_id):
+    return cache.get(_key(analysis_id))
+
+
+def store(analysis, data):
+    """Cache the pre-serialized body of a completed analysis"""
+    body = dumps(data)
+    entry = {
+        'user_id': analysis.user_id,
+        'etag': '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+        'immutable': is_final(analysis),
+        'body': body,
+    }
+    cache.set(_key(analysis.id), entry, timeout=settings.ANALYSIS_RESPONSE_CACHE_SECONDS)
+    return entry
+
+
+def invalidate(analysis_id):
+    cache.delete(_key(analysis_id))
+
+
+def respond(entry, if_none_match):
+    """Build a 200 or 304 response from a cache entry"""
+    candidates = [tag.strip() for tag in (if_none_match or '').split(',')]
+    if entry['etag'] in candidates or '*' in candidates:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if entry['immutable'] else REVALIDATE_CACHE_CONTROL
+    return response
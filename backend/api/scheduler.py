@@ -0,0 +1,114 @@
+"""Per-user fair scheduling of analysis jobs in front of Celery.
+
+Uploaded analyses wait in the database (``status='pending'`` with no
+``dispatched_at``) instead of going straight onto the Celery queue. The
+dispatcher hands them to Celery in round-robin order across users, serving
+short clips first, while respecting a global in-flight window and a
+per-user concurrency cap.
+"""
+import logging
+from collections import defaultdict, deque
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from core.models import Analysis
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ('pending', 'processing')
+
+
+def _round_robin(queues, in_flight, slots, last_served):
+    """Pick up to ``slots`` jobs, cycling over users.
+
+    Users served least recently go first. Each turn a user may take as many
+    jobs as their weight allows, up to the per-user concurrency cap.
+    """
+    cap = settings.SCHEDULER_PER_USER_CONCURRENCY
+    weights = settings.SCHEDULER_USER_WEIGHTS
+    epoch = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+    users = deque(sorted(queues, key=lambda user_id: last_served.get(user_id) or epoch))
+    picked = []
+    while users and len(picked) < slots:
+        user_id = users.popleft()
+        queue = queues[user_id]
+        quota = weights.get(user_id, 1)
+        while queue and quota > 0 and in_flight[user_id] < cap and len(picked) < slots:
+            picked.append(queue.popleft())
+            in_flight[user_id] += 1
+            quota -= 1
+        if queue and in_flight[user_id] < cap:
+            users.append(user_id)
+    return picked
+
+
+def select_jobs():
+    """Mark the next fair batch of waiting analyses as dispatched.
+
+    Returns the selected analyses; the caller enqueues them once the
+    transaction has committed.
+    """
+    in_flight = defaultdict(int)
+    rows = (Analysis.objects
+            .filter(status__in=IN_FLIGHT_STATUSES, dispatched_at__isnull=False)
+            .values('user_id').annotate(n=Count('id')))
+    for row in rows:
+        in_flight[row['user_id']] = row['n']
+
+    slots = settings.SCHEDULER_MAX_IN_FLIGHT - sum(in_flight.values())
+    if slots <= 0:
+        return []
+
+    waiting = (Analysis.objects
+               .select_for_update(skip_locked=True)
+               .filter(status='pending', dispatched_at__isnull=True)
+               .order_by('queued_at', 'id')[:settings.SCHEDULER_SCAN_LIMIT])
+
+    short_lane = defaultdict(deque)
+    normal_lane = defaultdict(deque)
+    for analysis in waiting:
+        is_short = (analysis.duration_seconds is not None
+                    and analysis.duration_seconds <= settings.SCHEDULER_SHORT_CLIP_SECONDS)
+        (short_lane if is_short else normal_lane)[analysis.user_id].append(analysis)
+
+    last_served = dict(Analysis.objects
+                       .filter(dispatched_at__isnull=False)
+                       .values('user_id').annotate(last=Max('dispatched_at'))
+                       .values_list('user_id', 'last'))
+
+    picked = _round_robin(short_lane, in_flight, slots, last_served)
+    picked += _round_robin(normal_lane, in_flight, slots - len(picked), last_served)
+
+    now = timezone.now()
+    for analysis in picked:
+        analysis.dispatched_at = now
+        analysis.save(update_fields=['dispatched_at', 'updated_at'])
+        logger.info("Dispatching analysis %s for user %s after %.1fs in queue",
+                    analysis.id, analysis.user_id, analysis.queue_wait_seconds or 0)
+    return picked
+
+
+def dispatch_pending(enqueue):
+    """Select the next batch and pass each analysis id to ``enqueue``.
+
+    A Redis lock serialises dispatchers so concurrent triggers cannot
+    overshoot the concurrency caps.
+    """
+    client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    lock = client.lock('analysis-scheduler', timeout=30, blocking_timeout=5)
+    if not lock.acquire():
+        return []
+    try:
+        with transaction.atomic():
+            picked = select_jobs()
+            for analysis in picked:
+                transaction.on_commit(lambda analysis_id=analysis.id: enqueue(analysis_id))
+        return [analysis.id for analysis in picked]
+    finally:
+        lock.release()
@@ -22,19 +22,23 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 class AnalysisSerializer(serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
+    queue_wait_seconds = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Analysis
         fields = [
-            'id', 'user', 'user_email', 'video', 'filename', 'status',
-            'transcript', 'grammar_score', 'fluency_score', 'politeness_score',
+            'id', 'user', 'user_email', 'video', 'media_state', 'filename', 'status',
+            'duration_seconds', 'media_info', 'queued_at', 'dispatched_at', 'queue_wait_seconds', 'profile',
+            'transcript', 'asr_model', 'grammar_score', 'fluency_score', 'politeness_score',
             'body_language_score', 'overall_score', 'detailed_feedback',
-            'video_stats', 'created_at', 'updated_at', 'completed_at'
+            'video_stats', 'stage_timings', 'created_at', 'updated_at', 'completed_at'
         ]
         read_only_fields = [
-            'id', 'user', 'status', 'transcript', 'grammar_score', 'fluency_score',
+            'id', 'user', 'media_state', 'status', 'duration_seconds', 'media_info', 'queued_at', 'dispatched_at', 'profile',
+            'transcript', 'asr_model', 'grammar_score', 'fluency_score',
             'politeness_score', 'body_language_score', 'overall_score',
-            'detailed_feedback', 'video_stats', 'created_at', 'updated_at', 'completed_at'
+            'detailed_feedback', 'video_stats', 'stage_timings', 'created_at', 'updated_at',
+            'completed_at'
         ]
 
 
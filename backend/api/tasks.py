@@ -1,17 +1,49 @@
-from celery import shared_task
+from celery import shared_task, chain, chord, group
+from django.conf import settings
 from django.utils import timezone
 from core.models import Analysis
-import os
-import whisper
+from .checkpoints import load_checkpoint, save_checkpoint, clear_checkpoints
+from . import scheduler
+from . import asr_policy
+from . import response_cache
+from . import percentiles
+from . import workspace
+from . import profiling
+from . import events
+from . import lifecycle
+import logging
+import time
+import subprocess
 from moviepy import VideoFileClip
-import language_tool_python
 import nltk
 import cv2
 import numpy as np
 
-# Initialize models
-whisper_model = whisper.load_model("base")
-grammar_tool = language_tool_python.LanguageTool('en-US')
+logger = logging.getLogger(__name__)
+
+# Models are loaded on first use so that each worker pool only pays for the
+# models its queue actually needs (cv workers never load whisper).
+_whisper_models = {}
+_grammar_tool = None
+
+
+def get_whisper_model(name="base"):
+    if name not in _whisper_models:
+        import whisper
+        _whisper_models[name] = whisper.load_model(name)
+    return _whisper_models[name]
+
+
+def get_grammar_tool():
+    """Shared LanguageTool servers if configured, else a local JVM"""
+    global _grammar_tool
+    if _grammar_tool is None and settings.LANGUAGETOOL_SERVERS:
+        from .languagetool import LanguageToolPool
+        _grammar_tool = LanguageToolPool(settings.LANGUAGETOOL_SERVERS)
+    elif _grammar_tool is None:
+        import language_tool_python
+        _grammar_tool = language_tool_python.LanguageTool('en-US')
+    return _grammar_tool
 
 # Download NLTK data
 try:
@@ -23,36 +55,180 @@ try:
 except LookupError:
     nltk.download('stopwords')
 
+
+def _retry_or_fail(task, analysis_id, exc):
+    """Retry a stage, marking the analysis failed once retries are exhausted"""
+    stage = task.name.rsplit('.', 1)[-1]
+    if task.request.retries >= task.max_retries:
+        Analysis.objects.filter(id=analysis_id).update(status='failed')
+        events.publish(analysis_id, 'failed', stage=stage, error=str(exc))
+        workspace.remove(analysis_id)
+        dispatch_pending_analyses.delay()
+        raise exc
+    events.publish(analysis_id, 'processing', event='stage_retry', stage=stage,
+                   attempt=task.request.retries + 1)
+    raise task.retry(exc=exc, countdown=60)
+
+
+@shared_task
+def dispatch_pending_analyses():
+    """Hand the next fair batch of queued analyses to the pipeline.
+
+    Triggered on upload and whenever a job finishes, and periodically by
+    celery beat as a safety net.
+    """
+    dispatched = scheduler.dispatch_pending(process_video_analysis.delay)
+    return {'dispatched': dispatched}
+
+
 @shared_task(bind=True)
 def process_video_analysis(self, analysis_id):
-    """Asynchronous task to process video and generate feedback"""
+    """Dispatch the analysis pipeline as a canvas of per-stage tasks.
+
+    extract -> transcribe -> nlp runs in parallel with the nonverbal
+    analysis; both branches join in ``finalize_analysis``. Stages are routed
+    to the ``asr``, ``cv`` and ``nlp`` queues (see ``CELERY_TASK_ROUTES``).
+    Stages that already have a checkpoint are skipped, so re-dispatching a
+    failed analysis resumes where it stopped.
+    """
+    analysis = Analysis.objects.get(id=analysis_id)
+    analysis.status = 'processing'
+    # Only the status: a full save could write back stale media fields
+    analysis.save(update_fields=['status', 'updated_at'])
+    events.publish(analysis_id, 'processing')
+
+    workflow = chord(
+        group(
+            chain(
+                extract_audio_stage.si(analysis_id),
+                transcribe_stage.s(analysis_id),
+                nlp_stage.s(analysis_id),
+            ),
+            nonverbal_stage.si(analysis_id),
+        ),
+        finalize_analysis.s(analysis_id),
+    )
+    workflow.apply_async()
+
+    return {'status': 'dispatched', 'analysis_id': analysis_id}
+
+
+@shared_task(bind=True, max_retries=3)
+def extract_audio_stage(self, analysis_id):
+    """Extract the audio track and return the path of the wav file"""
     try:
-        analysis = Analysis.objects.get(id=analysis_id)
-        analysis.status = 'processing'
-        analysis.save()
+        # Resumed after transcription: the audio is no longer needed
+        if load_checkpoint(analysis_id, 'transcribe'):
+            return None
+        checkpoint = load_checkpoint(analysis_id, 'extract')
+        if checkpoint:
+            return checkpoint.artifact_path
 
+        started = time.monotonic()
+        analysis = Analysis.objects.get(id=analysis_id)
         video_path = analysis.video.path
-        audio_path = video_path.replace('.mp4', '.wav')
+        audio_path = workspace.artifact_path(analysis_id, 'audio.wav')
+
+        # Over-long uploads are trimmed to the length preflight allowed
+        media = analysis.media_info or {}
+        with events.stage(analysis_id, 'extract'):
+            with profiling.stage(analysis_id, 'extract'):
+                video = VideoFileClip(video_path)
+                audio = video.audio.subclipped(0, media['analyze_seconds']) if media.get('trimmed') else video.audio
+                # 16 kHz mono is what whisper consumes, and keeps tmpfs usage low
+                audio.write_audiofile(audio_path, fps=16000, ffmpeg_params=['-ac', '1'], logger=None)
+                video.close()
 
-        # Extract audio
-        video = VideoFileClip(video_path)
-        video.audio.write_audiofile(audio_path, logger=None)
-        video.close()
+            save_checkpoint(analysis_id, 'extract', artifact_path=audio_path,
+                            elapsed_seconds=time.monotonic() - started)
+        return audio_path
+    except Exception as e:
+        _retry_or_fail(self, analysis_id, e)
 
-        # Transcribe audio
-        result = whisper_model.transcribe(audio_path)
-        transcript = result["text"]
 
-        # Analyze communication
-        comm_analysis = analyze_communication(transcript)
-        
-        # Analyze video (body language)
-        video_analysis = analyze_video_nonverbal(video_path)
+@shared_task(bind=True, max_retries=3)
+def transcribe_stage(self, audio_path, analysis_id):
+    """Transcribe the extracted audio with the model the ASR policy picks"""
+    try:
+        checkpoint = load_checkpoint(analysis_id, 'transcribe')
+        if checkpoint:
+            return checkpoint.result
+
+        started = time.monotonic()
+        analysis = Analysis.objects.get(id=analysis_id)
+        model_name = asr_policy.select_model_for(analysis)
+        with events.stage(analysis_id, 'transcribe'):
+            with profiling.stage(analysis_id, 'transcribe'):
+                result = get_whisper_model(model_name).transcribe(audio_path)
+            transcript = result["text"]
+            Analysis.objects.filter(id=analysis_id).update(asr_model=model_name)
+
+            save_checkpoint(analysis_id, 'transcribe', result=transcript,
+                            elapsed_seconds=time.monotonic() - started)
+        # The audio is only needed until the transcript is checkpointed; free
+        # it here, on the asr worker that owns the workspace
+        workspace.remove(analysis_id)
+        return transcript
+    except Exception as e:
+        _retry_or_fail(self, analysis_id, e)
+
+
+@shared_task(bind=True, max_retries=3)
+def nlp_stage(self, transcript, analysis_id):
+    """Run grammar, fluency and politeness analysis on the transcript"""
+    try:
+        checkpoint = load_checkpoint(analysis_id, 'nlp')
+        if checkpoint:
+            comm_analysis = checkpoint.result
+        else:
+            started = time.monotonic()
+            with events.stage(analysis_id, 'nlp'):
+                with profiling.stage(analysis_id, 'nlp'):
+                    comm_analysis = analyze_communication(transcript)
+                save_checkpoint(analysis_id, 'nlp', result=comm_analysis,
+                                elapsed_seconds=time.monotonic() - started)
+
+        return {
+            'transcript': transcript,
+            'comm_analysis': comm_analysis,
+        }
+    except Exception as e:
+        _retry_or_fail(self, analysis_id, e)
+
+
+@shared_task(bind=True, max_retries=3)
+def nonverbal_stage(self, analysis_id):
+    """Analyze body language from the video frames"""
+    try:
+        checkpoint = load_checkpoint(analysis_id, 'nonverbal')
+        if checkpoint:
+            return checkpoint.result
+
+        started = time.monotonic()
+        analysis = Analysis.objects.get(id=analysis_id)
+        with events.stage(analysis_id, 'nonverbal'):
+            with profiling.stage(analysis_id, 'nonverbal'):
+                video_analysis = analyze_video_nonverbal(analysis.video.path, analysis.media_info)
+
+            save_checkpoint(analysis_id, 'nonverbal', result=video_analysis,
+                            elapsed_seconds=time.monotonic() - started)
+        return video_analysis
+    except Exception as e:
+        _retry_or_fail(self, analysis_id, e)
+
+
+@shared_task(bind=True, max_retries=3)
+def finalize_analysis(self, stage_results, analysis_id):
+    """Score the joined stage results and persist them"""
+    try:
+        nlp_result, video_analysis = stage_results
+        transcript = nlp_result['transcript']
 
         # Generate scores
-        scores = generate_scores(comm_analysis, transcript, video_analysis)
+        scores = generate_scores(nlp_result['comm_analysis'], transcript, video_analysis)
 
         # Update analysis
+        analysis = Analysis.objects.get(id=analysis_id)
         analysis.transcript = transcript
         analysis.grammar_score = scores['grammar_score']
         analysis.fluency_score = scores['fluency_score']
@@ -63,19 +239,108 @@ def process_video_analysis(self, analysis_id):
         analysis.video_stats = scores.get('video_stats', {})
         analysis.status = 'completed'
         analysis.completed_at = timezone.now()
+        # Cleanup: drop stage artifacts, keeping only their timings
+        analysis.stage_timings = clear_checkpoints(analysis_id)
         analysis.save()
+        events.publish(analysis_id, 'completed', overall_score=scores['overall_score'])
+        workspace.remove(analysis_id)
+        try:
+            percentiles.record(scores)
+        except Exception:
+            # The analysis is saved; a missed ranking sample must not fail it
+            logger.warning('Could not record scores of analysis %s in the percentile sketches',
+                           analysis_id, exc_info=True)
 
-        # Cleanup
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        # Free the user's slot for their next queued video
+        dispatch_pending_analyses.delay()
 
         return {'status': 'success', 'analysis_id': analysis_id}
-
     except Exception as e:
+        _retry_or_fail(self, analysis_id, e)
+
+
+@shared_task
+def persist_score_sketches():
+    """Save the percentile sketches from Redis to the database"""
+    return {'counts': percentiles.persist()}
+
+
+@shared_task
+def apply_media_lifecycle():
+    """Proxy or delete the uploads of completed analyses and report the bytes reclaimed"""
+    return lifecycle.apply_policies()
+
+
+@shared_task
+def schedule_transcript_upgrades():
+    """Re-transcribe degraded analyses with the best model while idle"""
+    if not settings.ASR_UPGRADE_ENABLED or not asr_policy.system_idle():
+        return {'upgrades': []}
+
+    # Claimed analyses are skipped by later runs until rescored or timed out
+    analysis_ids = asr_policy.claim_upgrades(settings.ASR_UPGRADE_BATCH_SIZE)
+    for analysis_id in analysis_ids:
+        chain(
+            upgrade_transcript.si(analysis_id, settings.ASR_MAX_MODEL),
+            rescore_upgraded_transcript.s(analysis_id),
+        ).apply_async()
+    return {'upgrades': analysis_ids}
+
+
+@shared_task
+def upgrade_transcript(analysis_id, model_name):
+    """Transcribe the stored video again with a larger model"""
+    try:
         analysis = Analysis.objects.get(id=analysis_id)
-        analysis.status = 'failed'
-        analysis.save()
-        raise self.retry(exc=e, countdown=60, max_retries=3)
+        media = analysis.media_info or {}
+        if media.get('trimmed'):
+            # Only the part the user was told would be analyzed
+            audio = _load_audio_clip(analysis.video.path, media['analyze_seconds'])
+        else:
+            # whisper decodes the audio track straight from the video via ffmpeg
+            audio = analysis.video.path
+        result = get_whisper_model(model_name).transcribe(audio)
+    except Exception:
+        Analysis.objects.filter(id=analysis_id).update(asr_upgrade_started_at=None)
+        raise
+    return {'transcript': result["text"], 'model': model_name}
+
+
+@shared_task
+def rescore_upgraded_transcript(upgrade, analysis_id):
+    """Re-run NLP and scoring on the upgraded transcript"""
+    try:
+        analysis = Analysis.objects.get(id=analysis_id)
+        transcript = upgrade['transcript']
+        scores = generate_scores(analyze_communication(transcript), transcript, analysis.video_stats)
+    except Exception:
+        Analysis.objects.filter(id=analysis_id).update(asr_upgrade_started_at=None)
+        raise
+
+    analysis.transcript = transcript
+    analysis.asr_model = upgrade['model']
+    analysis.asr_upgrade_started_at = None
+    analysis.grammar_score = scores['grammar_score']
+    analysis.fluency_score = scores['fluency_score']
+    analysis.politeness_score = scores['politeness_score']
+    analysis.body_language_score = scores['body_language_score']
+    analysis.overall_score = scores['overall_score']
+    analysis.detailed_feedback = scores['detailed_feedback']
+    # Only these fields: media lifecycle may have moved the video meanwhile
+    analysis.save(update_fields=[
+        'transcript', 'asr_model', 'asr_upgrade_started_at', 'grammar_score', 'fluency_score',
+        'politeness_score', 'body_language_score', 'overall_score', 'detailed_feedback', 'updated_at',
+    ])
+    response_cache.invalidate(analysis_id)
+    return {'status': 'upgraded', 'analysis_id': analysis_id, 'model': upgrade['model']}
+
+
+def _load_audio_clip(path, seconds):
+    """The first ``seconds`` of the audio track as 16 kHz mono float32, as whisper consumes it"""
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-t', f'{seconds:.3f}', '-i', path,
+           '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', '16000', '-']
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
 
 
 def analyze_communication(transcript):
@@ -84,7 +349,7 @@ def analyze_communication(transcript):
     total_words = len(words)
 
     # Grammar analysis
-    matches = grammar_tool.check(transcript)
+    matches = get_grammar_tool().check(transcript)
     grammar_errors = len(matches)
     grammar_details = [{'message': m.message, 'context': m.context} for m in matches[:5]]
 
@@ -113,10 +378,14 @@ def analyze_communication(transcript):
     }
 
 
-def analyze_video_nonverbal(video_path):
+def analyze_video_nonverbal(video_path, media_info=None):
     """Analyze body language from video"""
     cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if media_info and media_info['video']['fps']:
+        # Frame budget from the preflight probe, limited to the analyzed length
+        total_frames = int(media_info['analyze_seconds'] * media_info['video']['fps'])
+    else:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
     face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
     
@@ -1,14 +1,23 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from core.models import User, Analysis
 from .serializers import (
     UserSerializer, UserRegistrationSerializer,
     AnalysisSerializer, AnalysisCreateSerializer, AnalysisListSerializer
 )
-from .tasks import process_video_analysis
+from .tasks import dispatch_pending_analyses
+from .preflight import preflight, upload_path, PreflightError, PreflightUnavailable
+from . import response_cache
+from . import admission
+from .percentiles import percentiles_for
+from . import profiling
+from . import events
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -80,21 +89,118 @@ class AnalysisViewSet(viewsets.ModelViewSet):
             return AnalysisListSerializer
         return AnalysisSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        # Completed analyses are served from a pre-serialized cache entry, so
+        # polling costs no query or serialization and can be answered with 304
+        entry = response_cache.get_entry(kwargs['pk'])
+        if entry is None or entry['user_id'] != request.user.id:
+            analysis = self.get_object()
+            serializer = self.get_serializer(analysis)
+            if analysis.status != 'completed':
+                return Response(serializer.data)
+            entry = response_cache.store(analysis, serializer.data)
+        return response_cache.respond(entry, request.headers.get('If-None-Match'))
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        response_cache.invalidate(serializer.instance.id)
+
+    def perform_destroy(self, instance):
+        analysis_id = instance.id
+        super().perform_destroy(instance)
+        response_cache.invalidate(analysis_id)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        analysis = serializer.save(user=request.user)
+        # Probe and admit the upload before the row exists: a pending row is
+        # dispatchable at once, so it must be inserted complete or not at all
+        try:
+            with upload_path(serializer.validated_data['video']) as path:
+                media = preflight(path)
+        except PreflightError as e:
+            return Response({'video': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        except PreflightUnavailable:
+            return Response({'error': "Uploads can't be checked right now (media tools unavailable)"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        duration = media['analyze_seconds']
+        
+        # Backpressure: refuse work beyond the in-flight video-seconds budget
+        admitted, seconds = admission.admit(duration)
+        if not admitted:
+            response = Response({'error': 'Server is at capacity, please retry later',
+                                 'retry_after': seconds},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(seconds)
+            return response
         
-        # Trigger async processing
-        process_video_analysis.delay(analysis.id)
+        analysis = serializer.save(user=request.user, queued_at=timezone.now(),
+                                   profile=profiling.should_profile(request),
+                                   duration_seconds=duration, media_info=media)
+        events.publish(analysis.id, 'pending')
         
+        # Queue for fair dispatch; the scheduler starts it when a slot is free
+        dispatch_pending_analyses.delay()
+        
+        return Response({
+            'id': analysis.id,
+            'message': 'Video uploaded successfully. Queued for processing.',
+            'status': 'pending',
+            'estimated_seconds': round(seconds),
+            'estimated_completion': admission.estimated_completion_time(seconds)
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        analysis = self.get_object()
+        # Requeue through the fair scheduler; the status filter makes a double
+        # POST a no-op instead of a second pipeline run
+        requeued = Analysis.objects.filter(id=analysis.id, status='failed').update(
+            status='pending', dispatched_at=None, queued_at=timezone.now(), updated_at=timezone.now())
+        if not requeued:
+            return Response({'error': 'Only failed analyses can be retried'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Stages with a stored checkpoint are skipped by the pipeline
+        events.publish(analysis.id, 'pending', event='resumed')
+        dispatch_pending_analyses.delay()
+
         return Response({
             'id': analysis.id,
-            'message': 'Video uploaded successfully. Processing started.',
+            'message': 'Analysis queued to resume.',
             'status': 'pending'
         }, status=status.HTTP_202_ACCEPTED)
 
+    @action(detail=True, methods=['get'], url_path='events',
+            renderer_classes=[JSONRenderer, events.EventStreamRenderer])
+    def status_events(self, request, pk=None):
+        """Server-sent status events until the analysis completes or fails"""
+        analysis = self.get_object()
+        response = StreamingHttpResponse(events.stream(analysis), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def profile(self, request, pk=None):
+        """Collapsed stacks of a profiled run, for flamegraph.pl or speedscope"""
+        analysis = self.get_object()
+        collapsed = profiling.load_profile(analysis.id)
+        if collapsed is None:
+            return Response({'error': 'No profile stored for this analysis'},
+                            status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(collapsed, content_type='text/plain; charset=utf-8')
+
+    @action(detail=True, methods=['get'])
+    def percentiles(self, request, pk=None):
+        analysis = self.get_object()
+        if analysis.status != 'completed':
+            return Response({'error': 'Analysis is not completed yet'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': analysis.id, 'percentiles': percentiles_for(analysis)})
+
     @action(detail=False, methods=['get'])
     def progress(self, request):
         analyses = self.get_queryset().filter(status='completed').order_by('created_at')
@@ -0,0 +1,157 @@
+"""Celery prefork bootstrap: load model weights once, before the pool forks.
+
+Models loaded in the parent process are inherited copy-on-write by every
+pool child. ``gc.freeze()`` moves the loaded objects out of the collector's
+reach, so the children's garbage collections don't write to (and thereby
+un-share) their pages.
+
+Each pool child also gets its own slice of the node's cores, and its torch
+and OpenCV thread pools are sized to that slice, so concurrent jobs don't
+oversubscribe the CPU.
+
+Every worker also sweeps its own node's job workspaces, which may sit on a
+tmpfs that no other node can see.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+
+from billiard.process import current_process
+from celery.signals import worker_init, worker_process_init, worker_ready
+from celery.worker.control import inspect_command
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import workspace
+from .resources import available_cores, partition, set_thread_budget
+
+logger = logging.getLogger(__name__)
+
+# Pool size of this worker, recorded in the parent and inherited by children
+_pool_size = None
+# Cores assigned to this pool child
+_core_slice = None
+
+_SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory(pid):
+    """Memory of a process in kB; PSS splits shared pages between sharers"""
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                field, _, value = line.partition(':')
+                if field in _SMAPS_FIELDS:
+                    usage[field.lower()] = int(value.split()[0])
+    except OSError:
+        return None
+    usage['shared'] = usage.pop('shared_clean', 0) + usage.pop('shared_dirty', 0)
+    usage['private'] = usage.pop('private_clean', 0) + usage.pop('private_dirty', 0)
+    return usage
+
+
+@worker_init.connect
+def record_pool_size(sender=None, **kwargs):
+    global _pool_size
+    _pool_size = getattr(sender, 'concurrency', None) or os.cpu_count()
+
+
+@worker_init.connect
+def preload_models(sender=None, **kwargs):
+    """Runs in the worker parent, before the pool children are forked"""
+    if not settings.WORKER_PRELOAD_WHISPER_MODELS:
+        return
+
+    from .tasks import get_whisper_model
+    for name in settings.WORKER_PRELOAD_WHISPER_MODELS:
+        model = get_whisper_model(name)
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+        logger.info('Preloaded whisper %s in worker parent', name)
+
+    gc.collect()
+    gc.freeze()
+    logger.info('Worker parent memory after preload: %s', read_memory(os.getpid()))
+
+
+@worker_process_init.connect
+def apply_core_budget(**kwargs):
+    """Give this pool child its slice of cores"""
+    global _core_slice
+    slices = partition(available_cores(), _pool_size or os.cpu_count())
+    index = getattr(current_process(), 'index', None) or 0
+    _core_slice = slices[index % len(slices)]
+    set_thread_budget(len(_core_slice))
+    if settings.WORKER_PIN_CPU_AFFINITY:
+        os.sched_setaffinity(0, _core_slice)
+    logger.info('Pool child %s: %d threads on cores %s%s', os.getpid(), len(_core_slice), _core_slice,
+                ' (pinned)' if settings.WORKER_PIN_CPU_AFFINITY else '')
+
+
+@worker_process_init.connect
+def report_child_memory(**kwargs):
+    logger.info('Pool child %s started: %s', os.getpid(), read_memory(os.getpid()))
+
+
+@worker_ready.connect
+def start_workspace_sweeper(sender=None, **kwargs):
+    """Sweep this node's workspaces at startup and every ``WORKSPACE_SWEEP_SECONDS``"""
+    def run():
+        while True:
+            try:
+                report = workspace.sweep()
+                logger.info('Workspace sweep: removed %d (%d bytes); %d left using %d bytes, %s bytes free',
+                            len(report['removed']), report['reclaimed_bytes'], report['workspaces'],
+                            report['workspace_bytes'], report['free_bytes'])
+            except Exception:
+                logger.warning('Workspace sweep failed', exc_info=True)
+            finally:
+                close_old_connections()
+            time.sleep(settings.WORKSPACE_SWEEP_SECONDS)
+
+    threading.Thread(target=run, name='workspace-sweeper', daemon=True).start()
+
+
+@inspect_command()
+def workspaces(state):
+    """Workspace disk usage on this node: `celery -A fluentiq inspect workspaces`"""
+    return workspace.usage()
+
+
+@inspect_command()
+def memory(state):
+    """Per-process memory of this worker: `celery -A fluentiq inspect memory`"""
+    parent = read_memory(os.getpid())
+    pids = state.consumer.pool.info.get('processes', [])
+    children = {pid: read_memory(pid) for pid in pids}
+    known = [usage for usage in [parent, *children.values()] if usage]
+    return {
+        'parent': parent,
+        'children': children,
+        'total_pss': sum(usage.get('pss', 0) for usage in known),
+    }
+
+
+@inspect_command()
+def resources(state):
+    """Core allocation of this worker: `celery -A fluentiq inspect resources`"""
+    pids = state.consumer.pool.info.get('processes', [])
+    slices = partition(available_cores(), _pool_size or len(pids) or 1)
+    children = {}
+    for pid in pids:
+        try:
+            affinity = sorted(os.sched_getaffinity(pid))
+        except OSError:
+            affinity = None
+        children[pid] = {'affinity': affinity}
+    return {
+        'cores': len(available_cores()),
+        'pool_size': _pool_size,
+        'threads_per_child': min(len(s) for s in slices),
+        'pinned': settings.WORKER_PIN_CPU_AFFINITY,
+        'children': children,
+    }
@@ -0,0 +1,94 @@
+"""Per-analysis working directories for intermediate artifacts.
+
+Each analysis writes its intermediates (the extracted audio) to its own
+``WORKSPACE_ROOT/analysis-<id>`` directory. Point ``WORKSPACE_ROOT`` at a
+tmpfs mount to keep them in RAM; the extract and transcribe stages both
+run on the ``asr`` queue, so that mount must be shared by the asr workers.
+The directory is removed when the analysis completes or finally fails.
+After a worker crash it is swept by ``sweep``, which every worker runs on
+its own node, once the analysis is no longer in flight, or once it is older
+than ``WORKSPACE_MAX_AGE_SECONDS``.
+A swept artifact only costs a re-extract: checkpoints whose files are
+missing are discarded.
+"""
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from core.models import Analysis
+
+PREFIX = 'analysis-'
+
+
+def workspace_dir(analysis_id):
+    path = Path(settings.WORKSPACE_ROOT) / f'{PREFIX}{analysis_id}'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def artifact_path(analysis_id, name):
+    return str(workspace_dir(analysis_id) / name)
+
+
+def _tree_bytes(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def remove(analysis_id):
+    """Delete an analysis's workspace, returning the bytes freed"""
+    path = Path(settings.WORKSPACE_ROOT) / f'{PREFIX}{analysis_id}'
+    if not path.exists():
+        return 0
+    freed = _tree_bytes(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return freed
+
+
+def _workspaces():
+    root = Path(settings.WORKSPACE_ROOT)
+    if not root.exists():
+        return {}
+    found = {}
+    for path in root.iterdir():
+        if path.is_dir() and path.name.startswith(PREFIX) and path.name[len(PREFIX):].isdigit():
+            found[int(path.name[len(PREFIX):])] = path
+    return found
+
+
+def sweep():
+    """Remove workspaces of analyses that are no longer in flight, or too old"""
+    found = _workspaces()
+    in_flight = set(Analysis.objects.filter(id__in=found, status__in=('pending', 'processing'))
+                    .values_list('id', flat=True))
+    cutoff = time.time() - settings.WORKSPACE_MAX_AGE_SECONDS
+
+    removed, reclaimed = [], 0
+    for analysis_id, path in found.items():
+        try:
+            stale = path.stat().st_mtime < cutoff
+        except FileNotFoundError:
+            continue
+        if analysis_id not in in_flight or stale:
+            reclaimed += remove(analysis_id)
+            removed.append(analysis_id)
+    return {'removed': removed, 'reclaimed_bytes': reclaimed, **usage()}
+
+
+def usage():
+    root = Path(settings.WORKSPACE_ROOT)
+    found = _workspaces()
+    return {
+        'workspaces': len(found),
+        'workspace_bytes': sum(_tree_bytes(path) for path in found.values()),
+        'free_bytes': shutil.disk_usage(root).free if root.exists() else None,
+    }
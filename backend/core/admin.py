@@ -1,15 +1,26 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Analysis
+from .models import User, Analysis, StageCheckpoint, ScoreSketch
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     list_display = ['email', 'username', 'is_staff', 'created_at']
     search_fields = ['email', 'username']
 
+class StageCheckpointInline(admin.TabularInline):
+    model = StageCheckpoint
+    extra = 0
+    readonly_fields = ['stage', 'artifact_path', 'elapsed_seconds', 'created_at']
+
 @admin.register(Analysis)
 class AnalysisAdmin(admin.ModelAdmin):
-    list_display = ['user', 'filename', 'status', 'overall_score', 'created_at']
-    list_filter = ['status', 'created_at']
+    list_display = ['user', 'filename', 'status', 'overall_score', 'media_state', 'created_at']
+    list_filter = ['status', 'media_state', 'created_at']
     search_fields = ['user__email', 'filename']
-    readonly_fields = ['created_at', 'updated_at', 'completed_at']
+    readonly_fields = ['created_at', 'updated_at', 'completed_at', 'stage_timings', 'media_bytes_reclaimed']
+    inlines = [StageCheckpointInline]
+
+@admin.register(ScoreSketch)
+class ScoreSketchAdmin(admin.ModelAdmin):
+    list_display = ['dimension', 'count', 'updated_at']
+    readonly_fields = ['dimension', 'data', 'count', 'updated_at']
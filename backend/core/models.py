@@ -20,14 +20,40 @@ class Analysis(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    MEDIA_STATE_CHOICES = [
+        ('original', 'Original upload'),
+        ('proxy', 'Low-bitrate proxy'),
+        # Transcoding failed; the original is kept and not retried
+        ('proxy_failed', 'Original (proxy failed)'),
+        # The proxy came out no smaller; the original is kept and not retried
+        ('proxy_skipped', 'Original (proxy not smaller)'),
+        ('deleted', 'Deleted'),
+    ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analyses')
     video = models.FileField(upload_to='videos/')
+    # What is left of the upload after media lifecycle (see api/lifecycle.py)
+    media_state = models.CharField(max_length=13, choices=MEDIA_STATE_CHOICES, default='original')
+    media_bytes_reclaimed = models.BigIntegerField(default=0)
     filename = models.CharField(max_length=255)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Seconds of video to analyze (after trimming) and the preflight probe
+    duration_seconds = models.FloatField(blank=True, null=True)
+    media_info = models.JSONField(blank=True, null=True)
+
+    # Scheduling: queued_at is set on upload, dispatched_at when the
+    # scheduler hands the job to Celery
+    queued_at = models.DateTimeField(blank=True, null=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+    # Stack-sample the pipeline stages (see api/profiling.py)
+    profile = models.BooleanField(default=False)
     
     # Results
     transcript = models.TextField(blank=True, null=True)
+    # Whisper model that produced the transcript (tiny/base/small)
+    asr_model = models.CharField(max_length=20, blank=True, null=True)
+    # Set while an idle-time re-transcription is queued or running
+    asr_upgrade_started_at = models.DateTimeField(blank=True, null=True)
     grammar_score = models.FloatField(blank=True, null=True)
     fluency_score = models.FloatField(blank=True, null=True)
     politeness_score = models.FloatField(blank=True, null=True)
@@ -37,6 +63,8 @@ class Analysis(models.Model):
     # Detailed feedback (JSON stored as text)
     detailed_feedback = models.JSONField(blank=True, null=True)
     video_stats = models.JSONField(blank=True, null=True)
+    # Wall time spent in each pipeline stage, in seconds
+    stage_timings = models.JSONField(blank=True, null=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -46,6 +74,51 @@ class Analysis(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Analyses'
+        indexes = [
+            # Lifecycle, upgrade and progress queries scan completed analyses by age
+            models.Index(fields=['status', 'completed_at'], name='analysis_status_completed'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.filename} ({self.status})"
+
+    @property
+    def queue_wait_seconds(self):
+        if self.queued_at is None or self.dispatched_at is None:
+            return None
+        return round((self.dispatched_at - self.queued_at).total_seconds(), 2)
+
+
+class StageCheckpoint(models.Model):
+    """Result of a finished pipeline stage, kept so retries can resume"""
+    STAGE_CHOICES = [
+        ('extract', 'Audio extraction'),
+        ('transcribe', 'Transcription'),
+        ('nlp', 'NLP analysis'),
+        ('nonverbal', 'Nonverbal analysis'),
+    ]
+
+    analysis = models.ForeignKey(Analysis, on_delete=models.CASCADE, related_name='checkpoints')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES)
+    result = models.JSONField(blank=True, null=True)
+    # File produced by the stage (e.g. extracted PCM), removed on cleanup
+    artifact_path = models.CharField(max_length=500, blank=True)
+    elapsed_seconds = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('analysis', 'stage')]
+
+    def __str__(self):
+        return f"{self.analysis_id} - {self.stage}"
+
+
+class ScoreSketch(models.Model):
+    """Persisted quantile sketch of one score dimension (see api/percentiles.py)"""
+    dimension = models.CharField(max_length=30, unique=True)
+    data = models.JSONField()
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dimension} ({self.count})"
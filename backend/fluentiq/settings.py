@@ -66,6 +66,16 @@ DATABASES = {
     )
 }
 
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    }
+}
+# Pre-serialized responses of completed analyses (see api/response_cache.py)
+ANALYSIS_RESPONSE_CACHE_SECONDS = 7 * 24 * 60 * 60
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -74,6 +84,97 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Each pipeline stage has its own queue so worker pools can be sized to the
+# real bottleneck, e.g. `celery -A fluentiq worker -Q asr -c 2`.
+# Orchestration and finalize tasks stay on the default `celery` queue.
+CELERY_TASK_ROUTES = {
+    'api.tasks.extract_audio_stage': {'queue': 'asr'},
+    'api.tasks.transcribe_stage': {'queue': 'asr'},
+    'api.tasks.nlp_stage': {'queue': 'nlp'},
+    'api.tasks.nonverbal_stage': {'queue': 'cv'},
+    'api.tasks.upgrade_transcript': {'queue': 'asr'},
+    'api.tasks.rescore_upgraded_transcript': {'queue': 'nlp'},
+    # Proxy transcodes are CPU-bound ffmpeg runs
+    'api.tasks.apply_media_lifecycle': {'queue': 'cv'},
+}
+# Stages are long-running; don't let one worker hoard queued jobs
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# Recycle a pool child once its RSS exceeds this many KiB. RSS includes the
+# copy-on-write pages shared with the parent, so keep this above the size of
+# the preloaded models.
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = int(os.getenv('CELERY_WORKER_MAX_MEMORY_PER_CHILD', '0')) or None
+# Whisper models loaded in the worker parent before forking (asr workers only),
+# e.g. WORKER_PRELOAD_WHISPER_MODELS=tiny,base
+WORKER_PRELOAD_WHISPER_MODELS = [m for m in os.getenv('WORKER_PRELOAD_WHISPER_MODELS', '').split(',') if m]
+# Each pool child gets cores // concurrency torch/OpenCV threads; optionally
+# pin each child to its own cores as well
+WORKER_PIN_CPU_AFFINITY = os.getenv('WORKER_PIN_CPU_AFFINITY', 'False') == 'True'
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-pending-analyses': {
+        'task': 'api.tasks.dispatch_pending_analyses',
+        'schedule': 10.0,
+    },
+    'schedule-transcript-upgrades': {
+        'task': 'api.tasks.schedule_transcript_upgrades',
+        'schedule': 300.0,
+    },
+    'persist-score-sketches': {
+        'task': 'api.tasks.persist_score_sketches',
+        'schedule': float(os.getenv('PERCENTILE_PERSIST_SECONDS', '300')),
+    },
+    'apply-media-lifecycle': {
+        'task': 'api.tasks.apply_media_lifecycle',
+        'schedule': 900.0,
+    },
+}
+
+# Fair scheduler in front of Celery (see api/scheduler.py)
+SCHEDULER_MAX_IN_FLIGHT = int(os.getenv('SCHEDULER_MAX_IN_FLIGHT', '8'))
+SCHEDULER_PER_USER_CONCURRENCY = int(os.getenv('SCHEDULER_PER_USER_CONCURRENCY', '2'))
+# Clips at most this long (seconds) go through the priority lane
+SCHEDULER_SHORT_CLIP_SECONDS = float(os.getenv('SCHEDULER_SHORT_CLIP_SECONDS', '90'))
+SCHEDULER_SCAN_LIMIT = 500
+# Optional weighted round-robin: {user_id: jobs per turn}, default 1
+SCHEDULER_USER_WEIGHTS = {}
+
+# Media preflight (see api/preflight.py): longer uploads are trimmed to
+# PREFLIGHT_MAX_DURATION_SECONDS, or rejected when the policy is 'reject'
+PREFLIGHT_MAX_DURATION_SECONDS = float(os.getenv('PREFLIGHT_MAX_DURATION_SECONDS', '1800'))
+PREFLIGHT_OVERLENGTH_POLICY = os.getenv('PREFLIGHT_OVERLENGTH_POLICY', 'trim')
+PREFLIGHT_MIN_DURATION_SECONDS = 1.0
+
+# Admission control (see api/admission.py): total seconds of video allowed
+# to be queued or processing before uploads get 429
+ADMISSION_BUDGET_SECONDS = float(os.getenv('ADMISSION_BUDGET_SECONDS', '3600'))
+# Completed analyses used to measure per-stage throughput
+ADMISSION_THROUGHPUT_SAMPLE = 50
+
+# Percentile rankings (see api/percentiles.py): how long a process reuses
+# its copy of the score sketches before re-reading them from Redis
+PERCENTILE_REFRESH_SECONDS = float(os.getenv('PERCENTILE_REFRESH_SECONDS', '30'))
+
+# Shared LanguageTool servers (comma-separated URLs). Every worker uses this
+# pool over keep-alive HTTP instead of starting its own JVM; when empty each
+# process falls back to a local LanguageTool.
+LANGUAGETOOL_SERVERS = [url for url in os.getenv('LANGUAGETOOL_SERVERS', '').split(',') if url]
+
+# Adaptive whisper model selection (see api/asr_policy.py)
+# Approximate CPU real-time factor per model, ordered from fastest to most accurate
+ASR_MODEL_RTF = {'tiny': 0.08, 'base': 0.2, 'small': 0.6}
+ASR_DEFAULT_MODEL = os.getenv('ASR_DEFAULT_MODEL', 'base')
+ASR_MAX_MODEL = os.getenv('ASR_MAX_MODEL', 'small')
+# Target seconds from transcription start to transcript for a single job
+ASR_TARGET_COMPLETION_SECONDS = float(os.getenv('ASR_TARGET_COMPLETION_SECONDS', '120'))
+ASR_WORKER_CONCURRENCY = int(os.getenv('ASR_CONCURRENCY', '2'))
+CV_WORKER_CONCURRENCY = int(os.getenv('CV_CONCURRENCY', '4'))
+NLP_WORKER_CONCURRENCY = int(os.getenv('NLP_CONCURRENCY', '2'))
+# Re-transcribe degraded analyses with ASR_MAX_MODEL when the system is idle
+ASR_UPGRADE_ENABLED = os.getenv('ASR_UPGRADE_ENABLED', 'False') == 'True'
+ASR_UPGRADE_BATCH_SIZE = int(os.getenv('ASR_UPGRADE_BATCH_SIZE', '2'))
+# An upgrade not finished after this long is assumed lost and may be re-queued
+ASR_UPGRADE_TIMEOUT_SECONDS = int(os.getenv('ASR_UPGRADE_TIMEOUT_SECONDS', '7200'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -96,6 +197,40 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media lifecycle (see api/lifecycle.py): after completion, replace uploads
+# with a low-bitrate proxy and/or delete them after MEDIA_DELETE_AFTER_DAYS
+# (0 keeps them). Each beat run handles up to MEDIA_LIFECYCLE_BATCH_SIZE.
+MEDIA_PROXY_AFTER_COMPLETION = os.getenv('MEDIA_PROXY_AFTER_COMPLETION', 'False') == 'True'
+MEDIA_DELETE_AFTER_DAYS = int(os.getenv('MEDIA_DELETE_AFTER_DAYS', '0'))
+MEDIA_LIFECYCLE_BATCH_SIZE = int(os.getenv('MEDIA_LIFECYCLE_BATCH_SIZE', '20'))
+MEDIA_PROXY_HEIGHT = 360
+MEDIA_PROXY_CRF = 32
+MEDIA_PROXY_AUDIO_BITRATE = '48k'
+
+# Per-analysis directories for intermediate artifacts (see api/workspace.py).
+# May be a tmpfs mount shared by the asr workers.
+WORKSPACE_ROOT = os.getenv('WORKSPACE_ROOT', str(MEDIA_ROOT / 'workspaces'))
+WORKSPACE_MAX_AGE_SECONDS = int(os.getenv('WORKSPACE_MAX_AGE_SECONDS', '21600'))
+# Each worker sweeps its own node's workspaces this often (see api/worker_bootstrap.py)
+WORKSPACE_SWEEP_SECONDS = int(os.getenv('WORKSPACE_SWEEP_SECONDS', '600'))
+
+# Opt-in pipeline profiling (see api/profiling.py): uploads with
+# 'X-Vocably-Profile: 1' are always profiled, plus this fraction of the rest
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_ROOT = os.getenv('PROFILE_ROOT', str(MEDIA_ROOT / 'profiles'))
+
+# Server-sent status events (see api/events.py). Each open stream holds a
+# web worker thread, so streams end after SSE_MAX_STREAM_SECONDS and the
+# browser's EventSource reconnects after SSE_RETRY_MILLISECONDS.
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = int(os.getenv('SSE_MAX_STREAM_SECONDS', '300'))
+SSE_RETRY_MILLISECONDS = 3000
+
+# Load testing only: replace the model backends with sleeping stubs, e.g.
+# 'transcribe=1.5,nlp=0.4' (see api/loadtest_stubs.py). Must be unset in production.
+LOADTEST_STUBS = os.getenv('LOADTEST_STUBS', '')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS
@@ -0,0 +1,89 @@
+"""One-shot backfill of Analysis.result_blob for rows created before it existed.
+
+Older rows only kept the scores and transcript. The feedback, resources and
+stats are rebuilt from the stored transcript (NLP only, no video decoding).
+Video stats cannot be recovered and are stored as None. The stored scores
+are kept as they are. Until a row is backfilled, GET /api/analysis/{id}
+serves it with ``no-cache`` instead of the immutable header, so clients
+pick up the rebuilt result.
+
+    python backfill_results.py [--batch-size 100] [--dry-run]
+    python backfill_results.py --stats-only
+"""
+import argparse
+import json
+from database import SessionLocal, Analysis, init_db, encode_result
+
+
+def rebuild_result(analysis: Analysis) -> dict:
+    from modules.nlp_engine import analyze_communication
+    from modules.scoring import generate_scores
+
+    transcript = analysis.transcript or ""
+    scores = generate_scores(analyze_communication(transcript), transcript)
+    return {
+        "transcript": transcript,
+        "grammar_score": analysis.grammar_score,
+        "fluency_score": analysis.fluency_score,
+        "politeness_score": analysis.politeness_score,
+        "body_language_score": analysis.body_language_score,
+        "overall_score": analysis.overall_score,
+        "overall_message": scores["overall_message"],
+        "detailed_feedback": scores["detailed_feedback"],
+        "resources": scores["resources"],
+        "stats": scores["stats"],
+        "video_stats": None
+    }
+
+
+def storage_report(db) -> dict:
+    """Compare the compressed blobs with the plain JSON they replace"""
+    rows = db.query(Analysis).filter(Analysis.result_blob.isnot(None)).yield_per(200)
+    count = blob_bytes = json_bytes = 0
+    for analysis in rows:
+        count += 1
+        blob_bytes += len(analysis.result_blob)
+        json_bytes += len(json.dumps(analysis.result, separators=(",", ":")).encode("utf-8"))
+    return {
+        "rows": count,
+        "avg_blob_bytes": round(blob_bytes / count) if count else 0,
+        "avg_json_bytes": round(json_bytes / count) if count else 0,
+        "compression_ratio": round(json_bytes / blob_bytes, 2) if blob_bytes else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="rebuild results without writing them")
+    parser.add_argument("--stats-only", action="store_true", help="only report storage per row")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if not args.stats_only:
+            done = 0
+            last_id = 0
+            while True:
+                batch = (db.query(Analysis)
+                         .filter(Analysis.result_blob.is_(None), Analysis.id > last_id)
+                         .order_by(Analysis.id).limit(args.batch_size).all())
+                if not batch:
+                    break
+                for analysis in batch:
+                    result = rebuild_result(analysis)
+                    if not args.dry_run:
+                        analysis.result_blob = encode_result(result)
+                    done += 1
+                last_id = batch[-1].id
+                if not args.dry_run:
+                    db.commit()
+                print(f"backfilled {done} rows")
+        print(json.dumps(storage_report(db), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare ASR backends by real-time factor and word error rate.
+
+Fixtures are audio files (.wav/.mp3/.flac/.m4a) next to a reference
+transcript with the same stem (.txt):
+
+    fixtures/intro.wav
+    fixtures/intro.txt
+
+    python -m benchmarks.asr_benchmark fixtures/ --backends whisper whisper-int8 ctranslate2
+
+RTF is decode wall time divided by audio duration (lower is faster); WER is
+computed on lower-cased words with punctuation stripped.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+from modules.asr_backends import BACKENDS, SAMPLE_RATE, load_audio, load_backend
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a")
+
+
+def normalize(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_fixtures(directory: Path) -> list:
+    fixtures = []
+    for path in sorted(directory.iterdir()):
+        reference = path.with_suffix(".txt")
+        if path.suffix.lower() in AUDIO_EXTENSIONS and reference.exists():
+            fixtures.append((path.name, load_audio(str(path)), reference.read_text()))
+    return fixtures
+
+
+def benchmark(name: str, model_name: str, fixtures: list) -> dict:
+    started = time.monotonic()
+    backend = load_backend(name, model_name)
+    load_seconds = time.monotonic() - started
+
+    audio_seconds = decode_seconds = 0.0
+    errors = words = 0
+    for _, audio, reference in fixtures:
+        started = time.monotonic()
+        result = backend.transcribe(audio)
+        decode_seconds += time.monotonic() - started
+        audio_seconds += len(audio) / SAMPLE_RATE
+        ref_words = len(normalize(reference))
+        errors += word_error_rate(reference, result["text"]) * ref_words
+        words += ref_words
+
+    return {
+        "backend": name,
+        "load_s": load_seconds,
+        "rtf": decode_seconds / audio_seconds if audio_seconds else 0.0,
+        "wer": errors / words if words else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", type=Path, help="directory of audio + reference .txt pairs")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--model", default="base", help="whisper model size for every backend")
+    parser.add_argument("--max-wer", type=float, default=None,
+                        help="recommend the fastest backend whose WER is at most this")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no audio/.txt fixture pairs found in {args.fixtures}")
+    total = sum(len(audio) for _, audio, _ in fixtures) / SAMPLE_RATE
+    print(f"{len(fixtures)} fixtures, {total:.1f}s of audio, model {args.model}\n")
+
+    results = []
+    print(f"{'backend':<14}{'load (s)':>10}{'RTF':>8}{'WER':>8}")
+    for name in args.backends:
+        try:
+            row = benchmark(name, args.model, fixtures)
+        except ImportError as e:
+            print(f"{name:<14}  skipped ({e})")
+            continue
+        results.append(row)
+        print(f"{row['backend']:<14}{row['load_s']:>10.1f}{row['rtf']:>8.3f}{row['wer']:>8.1%}")
+
+    if args.max_wer is not None:
+        eligible = [row for row in results if row["wer"] <= args.max_wer]
+        if eligible:
+            best = min(eligible, key=lambda row: row["rtf"])
+            print(f"\nFastest backend within WER {args.max_wer:.0%}: {best['backend']} "
+                  f"(set VOCABLY_ASR_BACKEND={best['backend']})")
+        else:
+            print(f"\nNo backend reached WER {args.max_wer:.0%}")
+
+
+if __name__ == "__main__":
+    main()
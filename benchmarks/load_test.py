@@ -0,0 +1,264 @@
+"""Async traffic generator for the FastAPI app and the Django API.
+
+Each virtual user signs up, logs in, then repeatedly uploads a video, waits
+for the result (the FastAPI upload is synchronous; the Django one is polled
+until it completes, or followed over its SSE status stream with --events),
+opens it and loads the dashboard. Per-endpoint
+throughput and p50/p95/p99 latency are reported at the end.
+
+Run against servers with stub backends so results reflect the web tier:
+
+    python -m benchmarks.stub_server --port 8000
+    python -m benchmarks.load_test --target fastapi --url http://localhost:8000 --users 50 --iterations 5
+
+    # Django: start the web process and all Celery workers with LOADTEST_STUBS=on
+    python -m benchmarks.load_test --target django --url http://localhost:8000 --users 50 --json report.json
+
+Requires httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# Upload payload for stub servers; pass --video to send a real file
+PLACEHOLDER_VIDEO = b"\x00\x00\x00\x18ftypmp42" + bytes(64 * 1024)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.started = time.monotonic()
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        """Time one request, recorded under ``endpoint`` (a route template)"""
+        started = time.monotonic()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.errors[endpoint] += 1
+            self.statuses[endpoint][type(e).__name__] += 1
+            return None
+        self.latencies[endpoint].append(time.monotonic() - started)
+        self.statuses[endpoint][response.status_code] += 1
+        if response.status_code >= 500:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        endpoints = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": sum(self.statuses[endpoint].values()),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0,
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1) if values else 0,
+                "errors": self.errors[endpoint],
+                "statuses": {str(code): count for code, count in self.statuses[endpoint].items()}
+            }
+        return {"elapsed_seconds": round(elapsed, 2), "endpoints": endpoints}
+
+
+def retry_after(response, cap: float) -> float:
+    try:
+        return min(cap, float(response.headers.get("Retry-After", 5)))
+    except ValueError:
+        return cap
+
+
+class FastAPIUser:
+    def __init__(self, client, recorder: Recorder, video: bytes, args):
+        self.client = client
+        self.rec = recorder
+        self.video = video
+        self.args = args
+
+    async def sign_in(self, email: str, password: str):
+        await self.rec.request(self.client, "POST /api/signup", "POST", "/api/signup",
+                               data={"name": "Load Test", "email": email, "password": password})
+        response = await self.rec.request(self.client, "POST /api/login", "POST", "/api/login",
+                                          data={"email": email, "password": password})
+        return response is not None and response.status_code == 200
+
+    async def iteration(self):
+        response = await self.rec.request(
+            self.client, "POST /analyze-video", "POST", "/analyze-video",
+            files={"file": ("loadtest.mp4", self.video, "video/mp4")}, timeout=self.args.upload_timeout)
+        if response is not None and response.status_code in (429, 503):
+            await asyncio.sleep(retry_after(response, self.args.max_backoff))
+        elif response is not None and response.status_code == 200:
+            analysis_id = response.json()["analysis_id"]
+            await self.rec.request(self.client, "GET /api/analysis/{id}", "GET", f"/api/analysis/{analysis_id}")
+            await self.rec.request(self.client, "GET /api/analysis/{id}/percentiles", "GET",
+                                   f"/api/analysis/{analysis_id}/percentiles")
+        await self.dashboard()
+
+    async def dashboard(self):
+        await self.rec.request(self.client, "GET /dashboard", "GET", "/dashboard")
+        await self.rec.request(self.client, "GET /api/me", "GET", "/api/me")
+        await self.rec.request(self.client, "GET /api/analyses", "GET", "/api/analyses")
+        await self.rec.request(self.client, "GET /api/progress", "GET", "/api/progress")
+
+
+class DjangoUser:
+    def __init__(self, client, recorder: Recorder, video: bytes, args):
+        self.client = client
+        self.rec = recorder
+        self.video = video
+        self.args = args
+
+    def _csrf(self) -> dict:
+        # SessionAuthentication enforces CSRF on unsafe methods once logged in
+        return {"X-CSRFToken": self.client.cookies.get("csrftoken", "")}
+
+    async def sign_in(self, email: str, password: str):
+        await self.rec.request(self.client, "POST /api/auth/register/", "POST", "/api/auth/register/",
+                               json={"email": email, "username": email.split("@")[0], "password": password})
+        response = await self.rec.request(self.client, "POST /api/auth/login/", "POST", "/api/auth/login/",
+                                          json={"email": email, "password": password}, headers=self._csrf())
+        return response is not None and response.status_code == 200
+
+    async def iteration(self):
+        response = await self.rec.request(
+            self.client, "POST /api/analyses/", "POST", "/api/analyses/",
+            files={"video": ("loadtest.mp4", self.video, "video/mp4")}, data={"filename": "loadtest.mp4"},
+            headers=self._csrf(), timeout=self.args.upload_timeout)
+        if response is not None and response.status_code == 429:
+            await asyncio.sleep(retry_after(response, self.args.max_backoff))
+        elif response is not None and response.status_code == 202:
+            wait = self.follow_events if self.args.events else self.poll
+            await wait(response.json()["id"])
+        await self.dashboard()
+
+    async def poll(self, analysis_id: int):
+        deadline = time.monotonic() + self.args.poll_timeout
+        while time.monotonic() < deadline:
+            response = await self.rec.request(self.client, "GET /api/analyses/{id}/", "GET",
+                                              f"/api/analyses/{analysis_id}/")
+            if response is not None and response.status_code == 200 \
+                    and response.json().get("status") in ("completed", "failed"):
+                if response.json()["status"] == "completed":
+                    await self.rec.request(self.client, "GET /api/analyses/{id}/percentiles/", "GET",
+                                           f"/api/analyses/{analysis_id}/percentiles/")
+                return
+            await asyncio.sleep(self.args.poll_interval)
+        self.rec.errors["poll timeout"] += 1
+
+    async def follow_events(self, analysis_id: int):
+        """Wait on the status event stream, reconnecting when the server ends it"""
+        deadline = time.monotonic() + self.args.poll_timeout
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            status = None
+            try:
+                async with self.client.stream("GET", f"/api/analyses/{analysis_id}/events/",
+                                              headers={"Accept": "text/event-stream"},
+                                              timeout=self.args.poll_timeout) as response:
+                    self.rec.statuses["GET /api/analyses/{id}/events/"][response.status_code] += 1
+                    if response.status_code != 200:
+                        self.rec.errors["GET /api/analyses/{id}/events/"] += 1
+                        return
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            status = json.loads(line[6:]).get("status")
+            except Exception as e:
+                self.rec.errors["GET /api/analyses/{id}/events/"] += 1
+                self.rec.statuses["GET /api/analyses/{id}/events/"][type(e).__name__] += 1
+                return
+            # Stream duration, i.e. how long the job was followed on one connection
+            self.rec.latencies["GET /api/analyses/{id}/events/"].append(time.monotonic() - started)
+            if status == "completed":
+                await self.rec.request(self.client, "GET /api/analyses/{id}/percentiles/", "GET",
+                                       f"/api/analyses/{analysis_id}/percentiles/")
+            if status in ("completed", "failed"):
+                return
+        self.rec.errors["poll timeout"] += 1
+
+    async def dashboard(self):
+        await self.rec.request(self.client, "GET /api/users/me/", "GET", "/api/users/me/")
+        await self.rec.request(self.client, "GET /api/analyses/", "GET", "/api/analyses/")
+        await self.rec.request(self.client, "GET /api/analyses/progress/", "GET", "/api/analyses/progress/")
+
+
+USER_TYPES = {"fastapi": FastAPIUser, "django": DjangoUser}
+
+
+async def run_user(index: int, user_type, recorder: Recorder, video: bytes, args, httpx):
+    # Spread arrivals over the ramp-up period
+    await asyncio.sleep(args.ramp_up * index / max(1, args.users))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        user = user_type(client, recorder, video, args)
+        email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        if not await user.sign_in(email, "loadtest-password"):
+            return
+        for _ in range(args.iterations):
+            await user.iteration()
+            await asyncio.sleep(random.uniform(0, 2 * args.think_time))
+
+
+async def run(args) -> dict:
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("The load test needs httpx: pip install httpx")
+
+    video = Path(args.video).read_bytes() if args.video else PLACEHOLDER_VIDEO
+    recorder = Recorder()
+    await asyncio.gather(*(run_user(i, USER_TYPES[args.target], recorder, video, args, httpx)
+                           for i in range(args.users)))
+    return recorder.report()
+
+
+def print_report(report: dict):
+    print(f"\n{'endpoint':<42} {'reqs':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<42} {stats['requests']:>6} {stats['throughput_rps']:>7} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['errors']:>6}")
+    print(f"\nelapsed {report['elapsed_seconds']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=sorted(USER_TYPES), default="fastapi")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=3, help="uploads per user")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between iterations")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--poll-timeout", type=float, default=600.0)
+    parser.add_argument("--events", action="store_true", help="django: follow the SSE stream instead of polling")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument("--upload-timeout", type=float, default=600.0)
+    parser.add_argument("--max-backoff", type=float, default=30.0, help="cap on Retry-After waits")
+    parser.add_argument("--video", help="video file to upload instead of the placeholder")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
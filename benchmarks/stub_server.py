@@ -0,0 +1,150 @@
+"""Run the FastAPI app with stub analysis backends for load testing.
+
+The stubs stand in for preflight, audio extraction, transcription
+(``transcribe_audio_detailed``), ``analyze_communication`` and the
+nonverbal analysis. Each one sleeps for a configurable latency (in a
+threadpool thread, like the real calls) and returns data of the real
+shape, so the web tier, scoring, storage and caches run unchanged.
+Whisper, the LanguageTool JVM and real videos are not needed.
+
+    python -m benchmarks.stub_server --latency transcribe=1.5,nlp=0.4,nonverbal=0.8 --port 8000
+    python -m benchmarks.load_test --target fastapi --url http://localhost:8000 --users 50
+
+State (database, workspaces, sketches) goes to a temporary directory unless
+``--state-dir`` is given. The Django API has its own stubs, enabled with the
+``LOADTEST_STUBS`` setting (see backend/api/loadtest_stubs.py).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Seconds per call; override with --latency stage=seconds,...
+DEFAULT_LATENCY = {"preflight": 0.02, "extract": 0.2, "transcribe": 1.0, "nlp": 0.3, "nonverbal": 0.5}
+
+STUB_TRANSCRIPT = (
+    "Thank you for having me today. I would like to walk you through our quarterly results. "
+    "Um, revenue grew by twelve percent, and uh, we expect the trend to continue next quarter. "
+    "Please let me know if you have any questions."
+)
+
+
+def parse_latency(spec: str) -> dict:
+    latency = dict(DEFAULT_LATENCY)
+    for item in filter(None, (spec or "").split(",")):
+        stage, _, seconds = item.partition("=")
+        if stage not in DEFAULT_LATENCY:
+            raise ValueError(f"Unknown stage {stage!r}; expected one of {', '.join(DEFAULT_LATENCY)}")
+        latency[stage] = float(seconds)
+    return latency
+
+
+class StubBackends:
+    def __init__(self, latency: dict, jitter: float = 0.2, video_seconds: float = 60.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.video_seconds = video_seconds
+
+    def _wait(self, stage: str):
+        seconds = self.latency.get(stage, 0)
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def preflight(self, path: str) -> dict:
+        self._wait("preflight")
+        return {
+            "duration": self.video_seconds,
+            "format": "mov,mp4,m4a,3gp,3g2,mj2",
+            "size_bytes": os.path.getsize(path),
+            "video": {"codec": "h264", "width": 1280, "height": 720, "fps": 30.0,
+                      "frames": int(self.video_seconds * 30)},
+            "audio": {"codec": "aac", "sample_rate": 44100, "channels": 2},
+            "trimmed": False,
+            "analyze_seconds": self.video_seconds
+        }
+
+    def extract_audio(self, video_path: str, audio_path: str, max_seconds: float = None):
+        self._wait("extract")
+        open(audio_path, "wb").close()
+
+    def transcribe_audio_detailed(self, audio_path: str) -> dict:
+        self._wait("transcribe")
+        return {
+            "text": STUB_TRANSCRIPT,
+            "segments": [],
+            "pauses": [{"start": 12.0, "end": 15.5, "duration": 3.5}],
+            "speech_seconds": round(self.video_seconds * 0.8, 2),
+            "total_seconds": self.video_seconds
+        }
+
+    def analyze_communication(self, transcript: str) -> dict:
+        self._wait("nlp")
+        words = transcript.split()
+        return {
+            "grammar_errors": random.randint(0, 4),
+            "grammar_details": [],
+            "total_words": len(words),
+            "total_sentences": max(1, transcript.count(".")),
+            "filler_count": random.randint(0, 5),
+            "repetitions": [],
+            "polite_count": random.randint(1, 4),
+            "impolite_count": 0
+        }
+
+    def analyze_video_samples(self, video_path: str, decoder: str = None, metadata: dict = None):
+        import numpy as np
+        from modules.video_analysis import SAMPLE_DTYPE
+
+        self._wait("nonverbal")
+        count = int(self.video_seconds * 2)
+        samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+        samples["t"] = np.arange(count) * 0.5
+        samples["faces"] = np.random.random(count) < 0.9
+        samples["eye_contact"] = samples["faces"] & (np.random.random(count) < 0.7)
+        samples["smiles"] = samples["faces"] & (np.random.random(count) < 0.2)
+        samples["motion"] = np.random.exponential(40000, count)
+        samples["dt"] = 0.5
+        return samples
+
+
+def install(app_module, stubs: StubBackends):
+    """Swap the pipeline functions ``main`` imported for the stubs"""
+    app_module.preflight = stubs.preflight
+    app_module.extract_audio = stubs.extract_audio
+    app_module.transcribe_audio_detailed = stubs.transcribe_audio_detailed
+    app_module.analyze_communication = stubs.analyze_communication
+    app_module.analyze_video_samples = stubs.analyze_video_samples
+    # Nothing to warm up
+    app_module.start_background_warmup = lambda: None
+    app_module.is_ready = lambda: True
+    app_module.readiness = lambda: {"ready": True, "components": {"stubs": "ready"}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", default="", help="per-stage seconds, e.g. transcribe=1.5,nlp=0.4")
+    parser.add_argument("--jitter", type=float, default=0.2, help="uniform +/- fraction applied to each latency")
+    parser.add_argument("--video-seconds", type=float, default=60.0, help="duration every upload reports")
+    parser.add_argument("--state-dir", help="directory for the database and job files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # Module-level settings are read on import, so set them before importing main
+    state_dir = args.state_dir or tempfile.mkdtemp(prefix="vocably-loadtest-")
+    os.environ.setdefault("VOCABLY_DATABASE_URL", f"sqlite:///{os.path.join(state_dir, 'loadtest.db')}")
+    os.environ.setdefault("VOCABLY_WORKSPACE_DIR", os.path.join(state_dir, "jobs"))
+    os.environ.setdefault("VOCABLY_TIMESERIES_DIR", os.path.join(state_dir, "timeseries"))
+    os.environ.setdefault("VOCABLY_PROFILE_DIR", os.path.join(state_dir, "profiles"))
+
+    import uvicorn
+    import main as app_module
+
+    install(app_module, StubBackends(parse_latency(args.latency), args.jitter, args.video_seconds))
+    print(f"Stub backends installed; state in {state_dir}")
+    uvicorn.run(app_module.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Offline bulk analysis of a folder or zip of recorded sessions.
+
+Runs the same modules/ pipeline as /analyze-video across a process pool.
+Each worker loads whisper and LanguageTool once. One JSONL line is written
+per video. Re-running with the same output file skips videos that already
+have an entry, so an interrupted run resumes where it stopped.
+
+    python bulk_analyze.py sessions/ -o results.jsonl --workers 4
+    python bulk_analyze.py sessions.zip -o results.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from modules.resources import available_cores, partition, set_thread_budget, pin_to
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+_pipeline = None
+
+
+def _init_worker(slot_counter, workers, pin):
+    """Give the worker its core slice, then load the pipeline models once"""
+    global _pipeline
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    slices = partition(available_cores(), workers)
+    cores = slices[slot % len(slices)]
+    set_thread_budget(len(cores))
+    if pin:
+        pin_to(cores)
+
+    from modules.warmup import warm_up
+    warm_up()
+    from modules.video_processor import extract_audio
+    from modules.speech_to_text import transcribe_audio_detailed
+    from modules.nlp_engine import analyze_communication
+    from modules.scoring import generate_scores
+    from modules.video_analysis import analyze_video_nonverbal
+    from modules.preflight import preflight
+    _pipeline = (preflight, extract_audio, transcribe_audio_detailed, analyze_communication,
+                 generate_scores, analyze_video_nonverbal)
+
+
+def list_videos(source: Path) -> list:
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            return sorted(name for name in archive.namelist() if name.lower().endswith(VIDEO_EXTENSIONS))
+    return sorted(str(path.relative_to(source)) for path in source.rglob("*")
+                  if path.suffix.lower() in VIDEO_EXTENSIONS)
+
+
+def analyze_one(source: str, name: str) -> dict:
+    (preflight, extract_audio, transcribe_audio_detailed, analyze_communication,
+     generate_scores, analyze_video_nonverbal) = _pipeline
+    started = time.monotonic()
+    try:
+        with tempfile.TemporaryDirectory(prefix="vocably-bulk-") as workdir:
+            if zipfile.is_zipfile(source):
+                with zipfile.ZipFile(source) as archive:
+                    video_path = archive.extract(name, workdir)
+            else:
+                video_path = os.path.join(source, name)
+            audio_path = os.path.join(workdir, "audio.wav")
+
+            media = preflight(video_path)
+            video_analysis = analyze_video_nonverbal(video_path, metadata=media)
+            extract_audio(video_path, audio_path, media["analyze_seconds"] if media["trimmed"] else None)
+            transcription = transcribe_audio_detailed(audio_path)
+            transcript = transcription["text"]
+            analysis = analyze_communication(transcript)
+            scores = generate_scores(analysis, transcript, video_analysis, pauses=transcription["pauses"])
+
+        return {"video": name, "duration_seconds": media["duration"], "trimmed": media["trimmed"],
+                "processing_seconds": round(time.monotonic() - started, 2),
+                "transcript": transcript, **scores}
+    except Exception as e:
+        return {"video": name, "error": str(e), "processing_seconds": round(time.monotonic() - started, 2)}
+
+
+def load_completed(output: Path, retry_errors: bool) -> set:
+    """Videos already in the output file; drops a torn final line first"""
+    if not output.exists():
+        return set()
+    with open(output, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    completed = set()
+    for line in data.splitlines():
+        entry = json.loads(line)
+        if retry_errors and "error" in entry:
+            continue
+        completed.add(entry["video"])
+    return completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, help="folder or .zip of videos")
+    parser.add_argument("-o", "--output", type=Path, default=Path("results.jsonl"))
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--pin", action="store_true", help="pin each worker to its own cores")
+    parser.add_argument("--retry-errors", action="store_true", help="re-run videos whose entry is an error (the new entry is appended)")
+    args = parser.parse_args()
+
+    videos = list_videos(args.source)
+    completed = load_completed(args.output, args.retry_errors)
+    pending = [name for name in videos if name not in completed]
+    print(f"{len(videos)} videos, {len(completed)} already done, {len(pending)} to analyze", file=sys.stderr)
+    if not pending:
+        return
+
+    started = time.monotonic()
+    done = failed = 0
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                initargs=(multiprocessing.Value("i", 0), args.workers, args.pin)) as pool:
+        futures = [pool.submit(analyze_one, str(args.source), name) for name in pending]
+        for future in as_completed(futures):
+            entry = future.result()
+            out.write(json.dumps(entry) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            done += 1
+            failed += "error" in entry
+            rate = done / (time.monotonic() - started) * 3600
+            print(f"[{done}/{len(pending)}] {entry['video']} "
+                  f"({'error' if 'error' in entry else 'ok'}) - {rate:.1f} videos/hour", file=sys.stderr)
+
+    elapsed = time.monotonic() - started
+    print(f"Analyzed {done} videos ({failed} failed) in {elapsed / 60:.1f} min: "
+          f"{done / elapsed * 3600:.1f} videos/hour", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
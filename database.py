@@ -1,14 +1,40 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text, LargeBinary, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import bcrypt
+import json
+import os
+import zlib
 
-DATABASE_URL = "sqlite:///./vocably.db"
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+DATABASE_URL = os.getenv("VOCABLY_DATABASE_URL", "sqlite:///./vocably.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Result blobs start with a one-byte codec tag so either encoding can be read
+# back regardless of whether msgpack is installed when the row was written
+_MSGPACK = b"m"
+_JSON = b"j"
+
+def encode_result(payload: dict) -> bytes:
+    if msgpack is not None:
+        return _MSGPACK + zlib.compress(msgpack.packb(payload, use_bin_type=True), 6)
+    return _JSON + zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 6)
+
+def decode_result(blob: bytes) -> dict:
+    codec, data = blob[:1], zlib.decompress(blob[1:])
+    if codec == _MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack is required to read this result")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -38,12 +64,41 @@ class Analysis(Base):
     politeness_score = Column(Float)
     body_language_score = Column(Float)
     overall_score = Column(Float)
+    # Full generate_scores payload, compressed (see encode_result)
+    result_blob = Column(LargeBinary)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="analyses")
+    
+    def set_result(self, payload: dict):
+        self.result_blob = encode_result(payload)
+        self._result = payload
+    
+    @property
+    def result(self) -> dict:
+        """Decompressed on first access only; None for rows without a blob"""
+        if self.result_blob is None:
+            return None
+        if getattr(self, "_result", None) is None:
+            self._result = decode_result(self.result_blob)
+        return self._result
+
+class ScoreSketch(Base):
+    """Stored quantile sketch of one score dimension (see modules/percentiles.py)"""
+    __tablename__ = "score_sketches"
+    
+    dimension = Column(String, primary_key=True)
+    data = Column(Text, nullable=False)
+    # Bumped on every write, so concurrent merges from several processes retry
+    version = Column(Integer, nullable=False, default=1)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all does not add columns to existing tables
+    columns = {c["name"] for c in inspect(engine).get_columns("analyses")}
+    if "result_blob" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE analyses ADD COLUMN result_blob BLOB"))
 
 def get_db():
     db = SessionLocal()
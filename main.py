@@ -1,23 +1,47 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Response, Cookie, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Response, Cookie, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import os
+import asyncio
 import shutil
-from pathlib import Path
-from modules.video_processor import extract_audio
-from modules.speech_to_text import transcribe_audio
+import threading
+import time
+from contextlib import nullcontext
+from modules.video_processor import extract_audio, WAV_BYTES_PER_SECOND
+from modules.speech_to_text import transcribe_audio_detailed
 from modules.nlp_engine import analyze_communication
-from modules.scoring import generate_scores
-from modules.video_analysis import analyze_video_nonverbal
-from database import init_db, get_db, User, Analysis
+from modules.scoring import generate_scores, score_body_language
+from modules.video_analysis import analyze_video_samples, summarize_nonverbal, MOVEMENT_PIXELS
+from modules.timeseries import save_series, load_series, timeline
+from modules.percentiles import ScoreRankings, SCORE_DIMENSIONS
+from modules.warmup import start_background_warmup, is_ready, readiness
+from modules.resources import CoreAllocator
+from modules.admission import AdmissionController, ThroughputTracker
+from modules.preflight import preflight, PreflightError, PreflightUnavailable
+from modules.workspace import WorkspaceManager, safe_suffix
+from modules.profiler import StackSampler, should_profile, save_profile, load_profile
+from database import init_db, get_db, SessionLocal, User, Analysis, ScoreSketch
 from auth import create_access_token, get_current_user_id
+from response_cache import (ResponseCache, dumps, make_etag, etag_matches, IMMUTABLE_CACHE_CONTROL,
+                            REVALIDATE_CACHE_CONTROL)
 from typing import Optional
 
 app = FastAPI(title="Vocably API")
 
-init_db()  # Initialize database
+@app.on_event("startup")
+async def startup():
+    init_db()  # Initialize database
+    # Seeding the sketches scans the analyses table, so it runs in the background too
+    threading.Thread(target=load_rankings, name="vocably-rankings", daemon=True).start()
+    workspaces.start_janitor()
+    # Models load in the background; pages and auth are served meanwhile
+    start_background_warmup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await run_in_threadpool(rankings.flush)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,11 +51,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Per-job workspaces under VOCABLY_WORKSPACE_DIR, intermediates optionally on
+# tmpfs (VOCABLY_SCRATCH_DIR); a janitor sweeps up after crashed jobs
+workspaces = WorkspaceManager()
+
+# Concurrent analyses each get their own slice of cores
+# (VOCABLY_MAX_CONCURRENT_JOBS, VOCABLY_PIN_CPU_AFFINITY)
+core_allocator = CoreAllocator()
+# Jobs wait for a slice here, on the event loop, so queued uploads don't park
+# threads of the shared threadpool the sync dependencies (auth, db) run in
+job_slots = asyncio.Semaphore(len(core_allocator.slices))
+
+# Backpressure: in-flight work is capped in video-seconds
+# (VOCABLY_ADMISSION_BUDGET_SECONDS); stage throughput feeds the estimates
+throughput = ThroughputTracker()
+admission = AdmissionController(throughput, parallel_jobs=len(core_allocator.slices))
 
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
+# Stored analyses are complete and never change, so responses are cached
+# pre-serialized, keyed by (user_id, analysis_id)
+analysis_cache = ResponseCache()
+
+# Score distributions as quantile sketches, so percentile lookups never scan
+# the analyses table; shared by the server processes through score_sketches
+rankings = ScoreRankings(SessionLocal, ScoreSketch)
+
+def load_rankings():
+    columns = [getattr(Analysis, dim) for dim in SCORE_DIMENSIONS]
+    rankings.load(lambda db: (dict(zip(SCORE_DIMENSIONS, row)) for row in db.query(*columns).yield_per(1000)))
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/api/system/resources")
+async def system_resources():
+    return {**core_allocator.snapshot(), "admission": admission.snapshot(), "workspaces": workspaces.usage()}
+
 @app.get("/")
 async def root():
     return FileResponse("frontend/index.html")
@@ -101,14 +163,88 @@ async def get_user_analyses(user_id: int = Depends(get_current_user_id), db: Ses
              "overall_score": a.overall_score, "created_at": a.created_at.isoformat()} for a in analyses]
 
 @app.get("/api/analysis/{analysis_id}")
-async def get_analysis(analysis_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
-    analysis = db.query(Analysis).filter(Analysis.id == analysis_id, Analysis.user_id == user_id).first()
-    if not analysis:
-        raise HTTPException(404, "Analysis not found")
-    return {"id": analysis.id, "filename": analysis.filename, "transcript": analysis.transcript,
+async def get_analysis(analysis_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                       if_none_match: Optional[str] = Header(None)):
+    cached = analysis_cache.get((user_id, analysis_id))
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    if cached is None:
+        analysis = db.query(Analysis).filter(Analysis.id == analysis_id, Analysis.user_id == user_id).first()
+        if not analysis:
+            raise HTTPException(404, "Analysis not found")
+        payload = {
+            "id": analysis.id, "filename": analysis.filename, "transcript": analysis.transcript,
             "grammar_score": analysis.grammar_score, "fluency_score": analysis.fluency_score,
             "politeness_score": analysis.politeness_score, "body_language_score": analysis.body_language_score,
             "overall_score": analysis.overall_score, "created_at": analysis.created_at.isoformat()}
+        # Feedback, resources and stats live in the compressed result blob
+        if analysis.result:
+            payload.update({key: value for key, value in analysis.result.items() if key not in payload})
+            cached = analysis_cache.put((user_id, analysis_id), payload)
+        else:
+            # Older row that backfill_results.py will still rewrite: revalidate, don't cache
+            body = dumps(payload)
+            cached = (make_etag(body), body)
+            cache_control = REVALIDATE_CACHE_CONTROL
+    
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _owned_series(analysis_id: int, user_id: int, db: Session):
+    exists = db.query(Analysis.id).filter(Analysis.id == analysis_id, Analysis.user_id == user_id).first()
+    if not exists:
+        raise HTTPException(404, "Analysis not found")
+    samples = load_series(analysis_id)
+    if samples is None:
+        raise HTTPException(404, "No nonverbal samples stored for this analysis")
+    return samples
+
+@app.get("/api/analysis/{analysis_id}/timeline")
+async def get_analysis_timeline(analysis_id: int, bins: int = 60, movement_pixels: float = MOVEMENT_PIXELS,
+                                user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    samples = _owned_series(analysis_id, user_id, db)
+    return {
+        "analysis_id": analysis_id,
+        "duration": round(float(samples["t"][-1]), 2) if len(samples) else 0,
+        "bins": timeline(samples, min(max(bins, 1), 500), movement_pixels)
+    }
+
+@app.get("/api/analysis/{analysis_id}/nonverbal")
+async def rescore_nonverbal(analysis_id: int, movement_pixels: float = MOVEMENT_PIXELS,
+                            user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """Re-derive the nonverbal stats from stored samples with a different movement threshold"""
+    samples = _owned_series(analysis_id, user_id, db)
+    video_stats = summarize_nonverbal(samples, movement_pixels)
+    return {
+        "analysis_id": analysis_id,
+        "movement_pixels": movement_pixels,
+        "video_stats": video_stats,
+        "body_language_score": round(score_body_language(video_stats))
+    }
+
+@app.get("/api/analysis/{analysis_id}/profile")
+async def get_analysis_profile(analysis_id: int, user_id: int = Depends(get_current_user_id),
+                               db: Session = Depends(get_db)):
+    """Collapsed stacks of a profiled run, for flamegraph.pl or speedscope"""
+    exists = db.query(Analysis.id).filter(Analysis.id == analysis_id, Analysis.user_id == user_id).first()
+    profile = load_profile(analysis_id) if exists else None
+    if profile is None:
+        raise HTTPException(404, "No profile stored for this analysis")
+    return PlainTextResponse(profile)
+
+@app.get("/api/analysis/{analysis_id}/percentiles")
+async def get_analysis_percentiles(analysis_id: int, user_id: int = Depends(get_current_user_id),
+                                   db: Session = Depends(get_db)):
+    columns = [getattr(Analysis, dim) for dim in SCORE_DIMENSIONS]
+    row = db.query(*columns).filter(Analysis.id == analysis_id, Analysis.user_id == user_id).first()
+    if not row:
+        raise HTTPException(404, "Analysis not found")
+    if not rankings.loaded:
+        raise HTTPException(503, "Score rankings are still loading, please retry shortly",
+                            headers={"Retry-After": "10"})
+    return {"analysis_id": analysis_id, "percentiles": rankings.percentiles(dict(zip(SCORE_DIMENSIONS, row)))}
 
 @app.get("/api/progress")
 async def get_user_progress(user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
@@ -135,23 +271,85 @@ async def get_user_progress(user_id: int = Depends(get_current_user_id), db: Ses
     }
     return progress_data
 
+def run_pipeline(video_path: str, audio_path: str, job_id: str, media: dict, profile: bool = False):
+    """Run the analysis modules within this job's core budget.
+
+    With ``profile`` the run is stack-sampled and the collapsed stacks are
+    returned last, else None.
+    """
+    duration = media["analyze_seconds"]
+    max_seconds = duration if media["trimmed"] else None
+    
+    def timed(stage, fn, *args, **kwargs):
+        started = time.monotonic()
+        result = fn(*args, **kwargs)
+        throughput.record(stage, duration, time.monotonic() - started)
+        return result
+    
+    sampler = StackSampler() if profile else None
+    with core_allocator.allocate(job_id), sampler or nullcontext():
+        samples = timed("nonverbal", analyze_video_samples, video_path, metadata=media)
+        video_analysis = summarize_nonverbal(samples)
+        timed("extract", extract_audio, video_path, audio_path, max_seconds)
+        transcription = timed("transcribe", transcribe_audio_detailed, audio_path)
+        transcript = transcription["text"]
+        analysis = timed("nlp", analyze_communication, transcript)
+        scores = timed("scoring", generate_scores, analysis, transcript, video_analysis,
+                       pauses=transcription["pauses"])
+    return transcript, scores, samples, sampler.collapsed("analysis") if sampler else None
+
 @app.post("/analyze-video")
-async def analyze_video(file: UploadFile = File(...), user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+async def analyze_video(file: UploadFile = File(...), user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db),
+                        x_vocably_profile: Optional[str] = Header(None)):
     if not file.filename.endswith(('.mp4', '.avi', '.mov', '.mkv')):
         raise HTTPException(400, "Invalid video format")
-    
-    video_path = UPLOAD_DIR / file.filename
-    audio_path = UPLOAD_DIR / f"{Path(file.filename).stem}.wav"
+    if not is_ready():
+        raise HTTPException(503, "Analysis models are still loading, please retry shortly",
+                            headers={"Retry-After": "10"})
     
     try:
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # The workspace (upload, extracted audio) is removed however the job ends
+        with workspaces.create() as workspace:
+            video_path = workspace.path("input" + safe_suffix(file.filename))
+            with open(video_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            
+            # Reject unusable files from container metadata before any decoding
+            try:
+                media = await run_in_threadpool(preflight, str(video_path))
+            except PreflightError as e:
+                raise HTTPException(422, str(e))
+            except PreflightUnavailable:
+                raise HTTPException(503, "Uploads can't be checked right now (media tools unavailable)")
+            
+            duration = media["analyze_seconds"]
+            job_id = workspace.job_id
+            if not admission.try_admit(job_id, duration):
+                raise HTTPException(429, "Server is at capacity, please retry later",
+                                    headers={"Retry-After": str(admission.retry_after(duration))})
+            audio_path = workspace.scratch("audio.wav", expected_bytes=int(duration * WAV_BYTES_PER_SECOND))
+            try:
+                async with job_slots:
+                    transcript, scores, samples, profile = await run_in_threadpool(
+                        run_pipeline, str(video_path), str(audio_path), job_id, media,
+                        should_profile(x_vocably_profile))
+            finally:
+                admission.release(job_id)
         
-        video_analysis = analyze_video_nonverbal(str(video_path))
-        extract_audio(str(video_path), str(audio_path))
-        transcript = transcribe_audio(str(audio_path))
-        analysis = analyze_communication(transcript)
-        scores = generate_scores(analysis, transcript, video_analysis)
+        result = {
+            "transcript": transcript,
+            "grammar_score": scores["grammar_score"],
+            "fluency_score": scores["fluency_score"],
+            "politeness_score": scores["politeness_score"],
+            "body_language_score": scores["body_language_score"],
+            "overall_score": scores["overall_score"],
+            "overall_message": scores["overall_message"],
+            "detailed_feedback": scores["detailed_feedback"],
+            "resources": scores["resources"],
+            "stats": scores["stats"],
+            "video_stats": scores["video_stats"],
+            "media": media
+        }
         
         # Save to database
         db_analysis = Analysis(
@@ -164,33 +362,22 @@ async def analyze_video(file: UploadFile = File(...), user_id: int = Depends(get
             body_language_score=scores["body_language_score"],
             overall_score=scores["overall_score"]
         )
+        db_analysis.set_result(result)
         db.add(db_analysis)
         db.commit()
         db.refresh(db_analysis)
+        if samples is not None:
+            save_series(db_analysis.id, samples)
+        # May merge into the stored sketches, which is database I/O
+        await run_in_threadpool(rankings.add, scores)
+        if profile:
+            save_profile(db_analysis.id, profile)
         
-        os.remove(video_path)
-        os.remove(audio_path)
-        
-        return {
-            "analysis_id": db_analysis.id,
-            "transcript": transcript,
-            "grammar_score": scores["grammar_score"],
-            "fluency_score": scores["fluency_score"],
-            "politeness_score": scores["politeness_score"],
-            "body_language_score": scores["body_language_score"],
-            "overall_score": scores["overall_score"],
-            "overall_message": scores["overall_message"],
-            "detailed_feedback": scores["detailed_feedback"],
-            "resources": scores["resources"],
-            "stats": scores["stats"],
-            "video_stats": scores["video_stats"]
-        }
+        return {"analysis_id": db_analysis.id, **result}
     
+    except HTTPException:
+        raise
     except Exception as e:
-        if video_path.exists():
-            os.remove(video_path)
-        if audio_path.exists():
-            os.remove(audio_path)
         raise HTTPException(500, f"Processing error: {str(e)}")
 
 @app.get("/results")
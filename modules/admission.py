@@ -0,0 +1,76 @@
+import os
+import threading
+
+# Total seconds of video that may be queued or processing at once
+ADMISSION_BUDGET_SECONDS = float(os.getenv("VOCABLY_ADMISSION_BUDGET_SECONDS", "1800"))
+
+# Processing seconds per second of video for each stage until real
+# measurements are available
+DEFAULT_STAGE_COST = {"nonverbal": 0.3, "extract": 0.05, "transcribe": 0.4, "nlp": 0.05, "scoring": 0.0}
+
+class ThroughputTracker:
+    """Moving average of each stage's cost in processing seconds per video-second"""
+
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self.costs = dict(DEFAULT_STAGE_COST)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, video_seconds: float, elapsed: float):
+        if video_seconds <= 0:
+            return
+        with self._lock:
+            cost = elapsed / video_seconds
+            previous = self.costs.get(stage, cost)
+            self.costs[stage] = previous + self.smoothing * (cost - previous)
+
+    def job_seconds(self, video_seconds: float) -> float:
+        """Expected wall time to run the whole pipeline on a clip"""
+        with self._lock:
+            return video_seconds * sum(self.costs.values())
+
+class AdmissionController:
+    """Bounds in-flight work by seconds of video rather than request count.
+
+    A job that does not fit in the remaining budget is refused, except when
+    nothing else is in flight, so a single long clip still gets through.
+    """
+
+    def __init__(self, throughput: ThroughputTracker, budget_seconds: float = ADMISSION_BUDGET_SECONDS,
+                 parallel_jobs: int = 1):
+        self.throughput = throughput
+        self.budget_seconds = budget_seconds
+        self.parallel_jobs = parallel_jobs
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight_seconds(self) -> float:
+        return sum(self._in_flight.values())
+
+    def try_admit(self, job_id, video_seconds: float) -> bool:
+        with self._lock:
+            if self._in_flight and self.in_flight_seconds + video_seconds > self.budget_seconds:
+                return False
+            self._in_flight[job_id] = video_seconds
+            return True
+
+    def release(self, job_id):
+        with self._lock:
+            self._in_flight.pop(job_id, None)
+
+    def retry_after(self, video_seconds: float) -> int:
+        """Seconds until enough in-flight work drains for this job to fit"""
+        with self._lock:
+            excess = self.in_flight_seconds + video_seconds - self.budget_seconds
+        drain = self.throughput.job_seconds(max(excess, 0)) / self.parallel_jobs
+        return int(min(600, max(5, drain)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "budget_seconds": self.budget_seconds,
+                "in_flight_seconds": round(self.in_flight_seconds, 1),
+                "in_flight_jobs": len(self._in_flight),
+                "stage_costs": {stage: round(cost, 3) for stage, cost in self.throughput.costs.items()}
+            }
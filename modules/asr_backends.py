@@ -0,0 +1,88 @@
+import os
+import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Selected by config; see BACKENDS for the choices
+ASR_BACKEND = os.getenv("VOCABLY_ASR_BACKEND", "whisper")
+ASR_MODEL = os.getenv("VOCABLY_ASR_MODEL", "base")
+# Decoding is the same on every backend so they differ only in speed; 1 is greedy
+ASR_BEAM_SIZE = int(os.getenv("VOCABLY_ASR_BEAM_SIZE", "1"))
+
+def pcm_command(path: str, sample_rate: int = SAMPLE_RATE, start: float = None, duration: float = None) -> list:
+    """ffmpeg command writing mono 16-bit PCM of ``path`` (or a slice of it) to stdout"""
+    seek = ["-ss", f"{start:.3f}"] if start else []
+    limit = ["-t", f"{duration:.3f}"] if duration else []
+    return (["ffmpeg", "-nostdin", "-v", "error"] + seek + limit + ["-i", path,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"])
+
+def load_audio(path: str, sample_rate: int = SAMPLE_RATE, start: float = None, duration: float = None) -> np.ndarray:
+    """Decode any media file, or ``duration`` seconds from ``start``, to mono float32 PCM with ffmpeg"""
+    out = subprocess.run(pcm_command(path, sample_rate, start, duration), capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+class ASRBackend:
+    """Speech recognizer for 16 kHz mono float32 PCM.
+
+    ``transcribe`` returns ``{"text": str, "segments": [{"start", "end", "text"}]}``
+    with timestamps in seconds relative to the given audio.
+    """
+    name = None
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        raise NotImplementedError
+
+class WhisperBackend(ASRBackend):
+    """Reference openai-whisper model running fp32 on CPU"""
+    name = "whisper"
+
+    def __init__(self, model_name: str = ASR_MODEL, beam_size: int = ASR_BEAM_SIZE):
+        import whisper
+        self.model = whisper.load_model(model_name, device="cpu")
+        self.beam_size = beam_size
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        # whisper decodes greedily only when no beam size is given
+        result = self.model.transcribe(audio, fp16=False, beam_size=self.beam_size if self.beam_size > 1 else None)
+        return {
+            "text": result["text"],
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+        }
+
+class QuantizedWhisperBackend(WhisperBackend):
+    """openai-whisper with int8 dynamically quantized Linear layers"""
+    name = "whisper-int8"
+
+    def __init__(self, model_name: str = ASR_MODEL, beam_size: int = ASR_BEAM_SIZE):
+        super().__init__(model_name, beam_size)
+        import torch
+        # whisper subclasses nn.Linear only to cast weights for fp16, which
+        # quantize_dynamic does not recognise; on CPU fp32 the plain class is
+        # equivalent
+        for module in self.model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class CTranslate2WhisperBackend(ASRBackend):
+    """Whisper converted to CTranslate2 (faster-whisper) with int8 compute"""
+    name = "ctranslate2"
+
+    def __init__(self, model_name: str = ASR_MODEL, beam_size: int = ASR_BEAM_SIZE, compute_type: str = "int8"):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type)
+        self.beam_size = beam_size
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        segments, _ = self.model.transcribe(audio, beam_size=self.beam_size)
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, QuantizedWhisperBackend, CTranslate2WhisperBackend)}
+
+def load_backend(name: str = None, model_name: str = None) -> ASRBackend:
+    name = name or ASR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name or ASR_MODEL)
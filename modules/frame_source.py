@@ -0,0 +1,90 @@
+import subprocess
+import cv2
+import numpy as np
+
+class FFmpegGrayFrames:
+    """Gray frames decoded, resampled and scaled by an ffmpeg subprocess.
+
+    ffmpeg does decode, fps conversion, scaling and color conversion natively
+    (``-vf fps=...,scale=...,format=gray``) and streams raw 8-bit frames that
+    are read straight into preallocated NumPy buffers. Buffers are reused in
+    rotation, so a yielded frame is only valid until the frame after next;
+    copy it if it must live longer.
+    """
+
+    def __init__(self, video_path: str, fps: float = 2.0, width: int = 480, buffers: int = 2,
+                 source_size: tuple = None, max_seconds: float = None):
+        self.video_path = video_path
+        self.fps = fps
+        self.max_seconds = max_seconds
+
+        if source_size:
+            self.source_width, self.source_height = source_size
+        else:
+            cap = cv2.VideoCapture(video_path)
+            self.source_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.source_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            cap.release()
+        if self.source_width <= 0 or self.source_height <= 0:
+            raise ValueError(f"Could not read frame size of {video_path}")
+
+        # Never upscale; keep even dimensions for the scaler
+        self.width = min(width, self.source_width) // 2 * 2
+        self.height = max(2, round(self.source_height * self.width / self.source_width / 2) * 2)
+        self._buffers = [np.empty((self.height, self.width), dtype=np.uint8) for _ in range(buffers)]
+
+    @property
+    def scale_factor(self) -> float:
+        """Ratio of output pixel count to source pixel count"""
+        return (self.width * self.height) / (self.source_width * self.source_height)
+
+    def __iter__(self):
+        cmd = [
+            "ffmpeg", "-v", "error", "-nostdin",
+            "-i", self.video_path,
+            *(["-t", str(self.max_seconds)] if self.max_seconds else []),
+            "-an", "-sn",
+            "-vf", f"fps={self.fps},scale={self.width}:{self.height},format=gray",
+            "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1",
+        ]
+        frame_bytes = self.width * self.height
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=frame_bytes)
+        try:
+            index = 0
+            while True:
+                frame = self._buffers[index % len(self._buffers)]
+                if not self._read_into(proc.stdout, memoryview(frame).cast("B"), frame_bytes):
+                    break
+                yield frame
+                index += 1
+        finally:
+            proc.stdout.close()
+            proc.kill()
+            proc.wait()
+
+    @staticmethod
+    def _read_into(stream, view, size: int) -> bool:
+        filled = 0
+        while filled < size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+
+def opencv_gray_frames(video_path: str, sample_rate: int, max_frames: int = None):
+    """Every ``sample_rate``-th frame, decoded by OpenCV and converted to gray"""
+    cap = cv2.VideoCapture(video_path)
+    frame_count = 0
+    try:
+        while cap.isOpened() and (max_frames is None or frame_count < max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count % sample_rate == 0:
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            frame_count += 1
+    finally:
+        cap.release()
+
@@ -0,0 +1,111 @@
+# Kept in step with backend/api/languagetool.py: the Django image is built
+# from backend/ alone, so the two apps can't import one shared module
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Mirrors the attributes of language_tool_python's Match that we use
+Match = namedtuple("Match", ["message", "context", "offset", "length", "rule_id", "replacements"])
+
+class LanguageToolPool:
+    """Grammar checks against a pool of shared LanguageTool HTTP servers.
+
+    Instead of one JVM per process, every worker talks to a few
+    ``languagetool-server`` instances over keep-alive connections. Requests
+    go to the healthy server with the fewest requests in flight. A server that
+    errors is taken out of rotation until a health check finds it up again.
+    Health checks run on a background thread, so a slow server never holds
+    up a check.
+    """
+
+    def __init__(self, urls, language: str = "en-US", connections_per_server: int = 4,
+                 timeout: float = 30, health_interval: float = 15, health_timeout: float = 2):
+        self.urls = [url.rstrip("/") for url in urls]
+        self.language = language
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.urls), pool_maxsize=connections_per_server)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._healthy = {url: True for url in self.urls}
+        self._in_flight = {url: 0 for url in self.urls}
+        self._tiebreak = itertools.count()
+        self._health_thread = None
+
+    def check(self, text: str) -> list:
+        self._ensure_health_checks()
+        tried = set()
+        while True:
+            url = self._acquire(tried)
+            if url is None:
+                raise RuntimeError("No healthy LanguageTool server available")
+            tried.add(url)
+            try:
+                response = self.session.post(f"{url}/v2/check", data={"language": self.language, "text": text},
+                                             timeout=self.timeout)
+                response.raise_for_status()
+                return [self._to_match(m) for m in response.json()["matches"]]
+            except requests.RequestException:
+                self._mark(url, healthy=False)
+            finally:
+                self._release(url)
+
+    def health_check(self) -> dict:
+        for url in self.urls:
+            try:
+                self.session.get(f"{url}/v2/languages", timeout=self.health_timeout).raise_for_status()
+                self._mark(url, healthy=True)
+            except requests.RequestException:
+                self._mark(url, healthy=False)
+        return dict(self._healthy)
+
+    def _ensure_health_checks(self):
+        # Also restarts the thread in a forked child, which doesn't inherit it
+        with self._lock:
+            if self._health_thread is not None and self._health_thread.is_alive():
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="languagetool-health", daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.health_check()
+
+    def _acquire(self, exclude):
+        with self._lock:
+            candidates = [url for url in self.urls if self._healthy[url] and url not in exclude]
+            if not candidates:
+                return None
+            offset = next(self._tiebreak)
+            url = min(candidates, key=lambda u: (self._in_flight[u], (self.urls.index(u) - offset) % len(self.urls)))
+            self._in_flight[url] += 1
+            return url
+
+    def _release(self, url):
+        with self._lock:
+            self._in_flight[url] -= 1
+
+    def _mark(self, url, healthy: bool):
+        with self._lock:
+            self._healthy[url] = healthy
+
+    @staticmethod
+    def _to_match(match: dict) -> Match:
+        return Match(
+            message=match["message"],
+            context=match["context"]["text"],
+            offset=match["offset"],
+            length=match["length"],
+            rule_id=match["rule"]["id"],
+            replacements=[r["value"] for r in match.get("replacements", [])],
+        )
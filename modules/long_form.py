@@ -0,0 +1,257 @@
+import atexit
+import multiprocessing
+import os
+import re
+import subprocess
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from modules.asr_backends import ASR_BACKEND, ASR_MODEL, SAMPLE_RATE, load_audio, load_backend, pcm_command
+from modules.resources import MAX_CONCURRENT_JOBS, available_cores, set_thread_budget
+from modules.vad import FRAME_MS, SpeechTimeline, detect_speech
+
+# Recordings at least this long are transcribed in windows (0 disables)
+LONGFORM_MIN_SECONDS = float(os.getenv("VOCABLY_LONGFORM_MIN_SECONDS", "600"))
+LONGFORM_WINDOW_SECONDS = float(os.getenv("VOCABLY_LONGFORM_WINDOW_SECONDS", "60"))
+# Each window also covers this much audio before its boundary, for stitching
+LONGFORM_OVERLAP_SECONDS = float(os.getenv("VOCABLY_LONGFORM_OVERLAP_SECONDS", "3"))
+# "vad" cuts at the quietest frame before each nominal boundary, "fixed" exactly on it
+LONGFORM_BOUNDARIES = os.getenv("VOCABLY_LONGFORM_BOUNDARIES", "vad")
+# Worker processes, each with its own model; 0 sizes the pool to the job's core share
+LONGFORM_WORKERS = int(os.getenv("VOCABLY_LONGFORM_WORKERS", "0"))
+CUT_SEARCH_SECONDS = 8.0
+# Words compared around each boundary; shorter shared runs fall back to timestamps
+ALIGN_WORDS = 40
+MIN_MATCH_WORDS = 2
+
+def audio_seconds(path: str):
+    """Duration from the WAV header without decoding, or None for other files"""
+    try:
+        with wave.open(path) as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+def frame_energies(path: str, sample_rate: int = SAMPLE_RATE):
+    """Per-frame energy (dB) of the recording, streamed from ffmpeg ~30 s at a time.
+
+    Returns the energies and the total number of samples; only the energies
+    (4 bytes per 30 ms frame) are kept.
+    """
+    frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+    cmd = pcm_command(path, sample_rate)
+    energies, total, leftover = [], 0, b""
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        while True:
+            chunk = proc.stdout.read(frame_bytes * 1000)
+            if not chunk:
+                break
+            data = leftover + chunk
+            usable = len(data) // frame_bytes * frame_bytes
+            leftover = data[usable:]
+            frames = np.frombuffer(data[:usable], np.int16).reshape(-1, frame_bytes // 2).astype(np.float32) / 32768.0
+            total += frames.size
+            energies.append(20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10))
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    total += len(leftover) // 2
+    return (np.concatenate(energies) if energies else np.zeros(0, np.float32)), total
+
+def plan_boundaries(energies, total_samples: int, mode: str = LONGFORM_BOUNDARIES,
+                    window_seconds: float = LONGFORM_WINDOW_SECONDS, sample_rate: int = SAMPLE_RATE) -> list:
+    """Sample offsets splitting the recording into windows of at most ``window_seconds``"""
+    frame_len = sample_rate * FRAME_MS // 1000
+    window = int(window_seconds * sample_rate)
+    search = int(CUT_SEARCH_SECONDS * 1000 / FRAME_MS)
+    boundaries = [0]
+    while total_samples - boundaries[-1] > window:
+        cut = boundaries[-1] + window
+        if mode == "vad":
+            last = min(cut // frame_len, len(energies))
+            first = max(boundaries[-1] // frame_len + 1, last - search)
+            if last > first:
+                # Latest quietest frame, so flat stretches cut near the nominal boundary
+                quietest = last - 1 - int(np.argmin(energies[first:last][::-1]))
+                cut = quietest * frame_len + frame_len // 2
+        boundaries.append(cut)
+    boundaries.append(total_samples)
+    return boundaries
+
+def transcribe_window(backend, path: str, start: int, end: int, keep_from: int, sample_rate: int = SAMPLE_RATE) -> dict:
+    """Transcribe samples [start, end) of the recording, skipping silence as the short-form path does.
+
+    Timestamps are absolute; speech regions are clipped to ``keep_from`` so
+    the overlap is not counted twice.
+    """
+    audio = load_audio(path, sample_rate, start=start / sample_rate, duration=(end - start) / sample_rate)
+    timeline = detect_speech(audio, sample_rate)
+    result = backend.transcribe(timeline.compact(audio)) if timeline.regions else {"segments": []}
+    offset = start / sample_rate
+    return {
+        "segments": [{"start": round(timeline.to_original(seg["start"]) + offset, 3),
+                      "end": round(timeline.to_original(seg["end"]) + offset, 3),
+                      "text": seg["text"]} for seg in result["segments"]],
+        "regions": [(max(region_start + start, keep_from), region_end + start)
+                    for region_start, region_end in timeline.regions if region_end + start > keep_from]
+    }
+
+_worker_backend = None
+
+def _init_worker(backend_name: str, model_name: str, threads: int):
+    global _worker_backend
+    set_thread_budget(threads)
+    _worker_backend = load_backend(backend_name, model_name)
+
+def _transcribe_window_in_worker(args) -> dict:
+    return transcribe_window(_worker_backend, *args)
+
+def pool_size(windows: int = None) -> tuple:
+    """Worker processes and threads per worker for one job's share of the cores"""
+    budget = max(1, len(available_cores()) // MAX_CONCURRENT_JOBS)
+    workers = max(1, LONGFORM_WORKERS or budget // 2)
+    if windows is not None:
+        workers = min(workers, windows)
+    return workers, max(1, budget // workers)
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+def _shared_pool(workers: int, threads: int) -> ProcessPoolExecutor:
+    """The process pool shared by all long-form jobs, created on first use.
+
+    Spawning the workers and loading one model each costs seconds, so the
+    pool outlives the job and is only recreated when its size changes.
+    """
+    global _pool, _pool_key
+    key = (ASR_BACKEND, ASR_MODEL, workers, threads)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=key[:2] + (threads,))
+            _pool_key = key
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_key = None, None
+    pool.shutdown(wait=False)
+
+def shutdown_pool():
+    """Stop the shared worker processes, if any were started"""
+    global _pool, _pool_key
+    with _pool_lock:
+        pool, _pool, _pool_key = _pool, None, None
+    if pool is not None:
+        pool.shutdown()
+
+atexit.register(shutdown_pool)
+
+def _norm(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch(results: list, boundaries: list, overlap_seconds: float = LONGFORM_OVERLAP_SECONDS,
+           sample_rate: int = SAMPLE_RATE) -> list:
+    """Join per-window segments, dropping words transcribed twice in the overlaps.
+
+    Around each boundary the previous window's last words and the next
+    window's first words are aligned. Where they share a run of words the
+    text switches windows at the end of that run. Otherwise the next
+    window's segments centred inside the overlap are dropped.
+    """
+    segments, tokens = {}, []
+    for i, result in enumerate(results):
+        incoming = []
+        for j, seg in enumerate(result["segments"]):
+            segments[i, j] = seg
+            incoming.extend((word, (i, j)) for word in seg["text"].split())
+        if not tokens or not incoming:
+            tokens.extend(incoming)
+            continue
+
+        boundary = boundaries[i] / sample_rate
+        tail_from = len(tokens)
+        while (tail_from > max(0, len(tokens) - ALIGN_WORDS)
+               and segments[tokens[tail_from - 1][1]]["end"] > boundary - overlap_seconds):
+            tail_from -= 1
+        head_to = 0
+        while head_to < min(len(incoming), ALIGN_WORDS) and segments[incoming[head_to][1]]["start"] < boundary:
+            head_to += 1
+
+        tail = [_norm(word) for word, _ in tokens[tail_from:]]
+        head = [_norm(word) for word, _ in incoming[:head_to]]
+        match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        if match.size >= MIN_MATCH_WORDS:
+            del tokens[tail_from + match.a + match.size:]
+            incoming = incoming[match.b + match.size:]
+        else:
+            incoming = [(word, key) for word, key in incoming
+                        if (segments[key]["start"] + segments[key]["end"]) / 2 >= boundary]
+        tokens.extend(incoming)
+
+    stitched = []
+    for word, key in tokens:
+        if stitched and stitched[-1][0] == key:
+            stitched[-1][1].append(word)
+        else:
+            stitched.append((key, [word]))
+    return [{"start": segments[key]["start"], "end": segments[key]["end"], "text": " ".join(words)}
+            for key, words in stitched]
+
+def transcribe_long_form(audio_path: str, get_backend=None) -> dict:
+    """Transcribe a long recording in overlapping windows, in parallel and bounded memory.
+
+    The PCM is never decoded whole. A first pass streams it to pick window
+    boundaries, then each window (extended ``LONGFORM_OVERLAP_SECONDS``
+    back) is decoded, voice-detected and transcribed by a pool of spawned
+    worker processes, each loading its own model. The pool is kept between
+    jobs; concurrent jobs queue their windows on it. Peak memory is one
+    window per worker plus the models. Inside daemonic processes (e.g. the
+    bulk analyzer's pool), which cannot have children, the windows run
+    one by one on ``get_backend()``. Returns the same shape as
+    ``transcribe_audio_detailed``.
+    """
+    energies, total_samples = frame_energies(audio_path)
+    boundaries = plan_boundaries(energies, total_samples)
+    overlap = int(LONGFORM_OVERLAP_SECONDS * SAMPLE_RATE)
+    windows = [(audio_path, max(0, start - overlap), end, start) for start, end in zip(boundaries, boundaries[1:])]
+
+    workers, _ = pool_size(len(windows))
+    if workers == 1 or multiprocessing.current_process().daemon:
+        backend = get_backend() if get_backend else load_backend()
+        results = [transcribe_window(backend, *window) for window in windows]
+    else:
+        pool = _shared_pool(*pool_size())
+        try:
+            results = list(pool.map(_transcribe_window_in_worker, windows))
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory): start fresh for the next job
+            _discard_pool(pool)
+            raise
+
+    regions = []
+    for result in results:
+        for start, end in result["regions"]:
+            if regions and start <= regions[-1][1]:
+                regions[-1] = (regions[-1][0], max(end, regions[-1][1]))
+            else:
+                regions.append((start, end))
+    timeline = SpeechTimeline(regions, total_samples)
+    segments = stitch(results, boundaries)
+
+    return {
+        "text": " ".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "pauses": timeline.pauses,
+        "speech_seconds": round(timeline.speech_seconds, 2),
+        "total_seconds": round(timeline.total_seconds, 2)
+    }
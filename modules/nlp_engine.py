@@ -1,21 +1,40 @@
-import language_tool_python
+import os
 import re
+import threading
 import nltk
 from collections import Counter
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+# Comma-separated URLs of shared LanguageTool servers. When unset, a local
+# LanguageTool JVM is started on first use or by the warmup task.
+LANGUAGETOOL_SERVERS = [url for url in os.getenv("LANGUAGETOOL_SERVERS", "").split(",") if url]
 
-tool = language_tool_python.LanguageTool('en-US')
+_tool = None
+_tool_lock = threading.Lock()
+
+def ensure_nltk_data():
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt', quiet=True)
+
+def get_tool():
+    global _tool
+    with _tool_lock:
+        if _tool is None and LANGUAGETOOL_SERVERS:
+            from modules.languagetool_pool import LanguageToolPool
+            _tool = LanguageToolPool(LANGUAGETOOL_SERVERS)
+        elif _tool is None:
+            import language_tool_python
+            _tool = language_tool_python.LanguageTool('en-US')
+    return _tool
 
 FILLER_WORDS = ['um', 'uh', 'like', 'you know', 'so', 'actually', 'basically', 'literally']
 POLITE_WORDS = ['please', 'thank', 'appreciate', 'kindly', 'would', 'could', 'may']
 IMPOLITE_PATTERNS = ['must', 'have to', 'need to', 'should']
 
 def analyze_communication(transcript: str) -> dict:
-    grammar_errors = tool.check(transcript)
+    ensure_nltk_data()
+    grammar_errors = get_tool().check(transcript)
     sentences = nltk.sent_tokenize(transcript)
     words = transcript.lower().split()
     
@@ -0,0 +1,230 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+SCORE_DIMENSIONS = ("grammar_score", "fluency_score", "politeness_score", "body_language_score", "overall_score")
+
+# New values are merged into the stored sketches at most this often, and on shutdown
+PERSIST_SECONDS = float(os.getenv("VOCABLY_PERCENTILE_PERSIST_SECONDS", "60"))
+SAVE_ATTEMPTS = 5
+
+class KLLSketch:
+    """KLL quantile sketch: bounded memory, mergeable, ~1% rank error at k=200.
+
+    Level ``h`` holds items that each stand for ``2**h`` inserted values. A
+    full level is sorted and every other item is promoted, so memory stays
+    O(k) however many values are added.
+    """
+
+    def __init__(self, k: int = 200, compactors: list = None, n: int = 0):
+        self.k = k
+        self.compactors = compactors or [[]]
+        self.n = n
+        self._cdf = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        while sum(len(c) for c in self.compactors) >= sum(self._capacity(h) for h in range(len(self.compactors))):
+            for h, items in enumerate(self.compactors):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                # An odd item out stays at this level
+                keep = [items.pop()] if len(items) % 2 else []
+                self.compactors[h + 1].extend(items[random.getrandbits(1)::2])
+                self.compactors[h] = keep
+                break
+
+    def update(self, value: float):
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._cdf = None
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        self._cdf = None
+        self._compress()
+
+    def _weighted(self):
+        if self._cdf is None:
+            pairs = sorted((v, 1 << h) for h, items in enumerate(self.compactors) for v in items)
+            values, cumulative, total = [], [], 0
+            for value, weight in pairs:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._cdf = (values, cumulative, total)
+        return self._cdf
+
+    def percentile(self, value: float) -> float:
+        """Share of values below ``value`` (ties count half), 0-100"""
+        values, cumulative, total = self._weighted()
+        if not total:
+            return None
+        lo = bisect_left(values, value)
+        hi = bisect_right(values, value)
+        below = cumulative[lo - 1] if lo else 0
+        at_or_below = cumulative[hi - 1] if hi else 0
+        return (below + at_or_below) / 2 / total * 100
+
+    def quantile(self, q: float) -> float:
+        values, cumulative, total = self._weighted()
+        if not total:
+            return None
+        return values[min(bisect_left(cumulative, q * total), len(values) - 1)]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        return cls(data["k"], [list(c) for c in data["compactors"]], data["n"])
+
+def _empty() -> dict:
+    return {dim: KLLSketch() for dim in SCORE_DIMENSIONS}
+
+def _add(sketches: dict, scores: dict):
+    for dim in SCORE_DIMENSIONS:
+        if scores.get(dim) is not None:
+            sketches[dim].update(scores[dim])
+
+class ScoreRankings:
+    """One sketch per score dimension, shared by all server processes through the database.
+
+    Each process answers lookups from its own copy and keeps the values it
+    added since its last save apart. A save merges those into the stored
+    sketches under a version check, retrying when another process saved in
+    between, and refreshes the local copy with everyone's values.
+    """
+
+    def __init__(self, session_factory, model, persist_seconds: float = PERSIST_SECONDS):
+        self.session_factory = session_factory
+        self.model = model
+        self.persist_seconds = persist_seconds
+        self.sketches = _empty()
+        self._pending = _empty()
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self.loaded = False
+
+    def _read(self, db) -> dict:
+        return {row.dimension: KLLSketch.from_dict(json.loads(row.data)) for row in db.query(self.model)}
+
+    def load(self, rows=None):
+        """Read the stored sketches, seeding them from ``rows(db)`` (score dicts) when there are none"""
+        db = self.session_factory()
+        seeded = False
+        try:
+            stored = self._read(db)
+            if not stored and rows is not None:
+                stored = _empty()
+                for scores in rows(db):
+                    _add(stored, scores)
+                try:
+                    for dim, sketch in stored.items():
+                        db.add(self.model(dimension=dim, data=json.dumps(sketch.to_dict()), version=1))
+                    db.commit()
+                    seeded = True
+                except IntegrityError:
+                    # Another process seeded them first
+                    db.rollback()
+                    stored = self._read(db)
+        finally:
+            db.close()
+        with self._lock:
+            if seeded:
+                # Analyses are committed before they are added, so the scan counted them
+                self._pending = _empty()
+            self._refresh(stored)
+            self.loaded = True
+
+    def _refresh(self, stored: dict):
+        sketches = _empty()
+        sketches.update(stored)
+        for dim in SCORE_DIMENSIONS:
+            sketches[dim].merge(self._pending[dim])
+        self.sketches = sketches
+
+    def add(self, scores: dict, persist: bool = True):
+        with self._lock:
+            _add(self.sketches, scores)
+            _add(self._pending, scores)
+        if persist and time.monotonic() - self._saved_at >= self.persist_seconds:
+            try:
+                self.save()
+            except Exception:
+                # The values stay pending for the next save; the analysis itself is stored
+                logger.warning("Could not save score sketches", exc_info=True)
+
+    def percentiles(self, scores: dict) -> dict:
+        with self._lock:
+            result = {}
+            for dim in SCORE_DIMENSIONS:
+                pct = self.sketches[dim].percentile(scores[dim]) if scores.get(dim) is not None else None
+                result[dim] = round(pct) if pct is not None else None
+            return result
+
+    def _merge_stored(self, pending: dict) -> dict:
+        for _ in range(SAVE_ATTEMPTS):
+            db = self.session_factory()
+            try:
+                rows = {row.dimension: row for row in db.query(self.model)}
+                merged = {}
+                for dim in SCORE_DIMENSIONS:
+                    row = rows.get(dim)
+                    sketch = KLLSketch.from_dict(json.loads(row.data)) if row else KLLSketch()
+                    sketch.merge(pending[dim])
+                    merged[dim] = sketch
+                    data = json.dumps(sketch.to_dict())
+                    if row is None:
+                        db.add(self.model(dimension=dim, data=data, version=1))
+                    elif not (db.query(self.model)
+                              .filter(self.model.dimension == dim, self.model.version == row.version)
+                              .update({"data": data, "version": row.version + 1}, synchronize_session=False)):
+                        break
+                else:
+                    db.commit()
+                    return merged
+                db.rollback()
+            except IntegrityError:
+                db.rollback()
+            finally:
+                db.close()
+        raise RuntimeError("Score sketches kept changing during the save")
+
+    def save(self):
+        with self._lock:
+            pending, self._pending = self._pending, _empty()
+            self._saved_at = time.monotonic()
+        try:
+            stored = self._merge_stored(pending)
+        except Exception:
+            with self._lock:
+                for dim in SCORE_DIMENSIONS:
+                    self._pending[dim].merge(pending[dim])
+            raise
+        with self._lock:
+            self._refresh(stored)
+
+    def flush(self):
+        if any(sketch.n for sketch in self._pending.values()):
+            self.save()
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+
+# Longer recordings are trimmed to this many seconds, or rejected when
+# VOCABLY_OVERLENGTH_POLICY=reject
+MAX_DURATION_SECONDS = float(os.getenv("VOCABLY_MAX_DURATION_SECONDS", "1800"))
+OVERLENGTH_POLICY = os.getenv("VOCABLY_OVERLENGTH_POLICY", "trim")
+MIN_DURATION_SECONDS = 1.0
+
+class PreflightError(ValueError):
+    """The file can't be analyzed; the message is safe to show to the user"""
+
+class PreflightUnavailable(RuntimeError):
+    """ffprobe is missing, so no upload can be checked; a server problem, not the file's"""
+
+def _fps(rate: str) -> float:
+    num, _, den = (rate or "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+def probe(path: str) -> dict:
+    """Container metadata from ffprobe; reads headers only, no decoding"""
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except FileNotFoundError:
+        raise PreflightUnavailable("ffprobe is not installed")
+    except subprocess.TimeoutExpired:
+        raise PreflightError("The file took too long to read as a video")
+    if proc.returncode != 0:
+        raise PreflightError("The file could not be read as a video (corrupt or unsupported format)")
+    try:
+        return _parse(json.loads(proc.stdout))
+    except (ValueError, TypeError):
+        # Malformed output or values such as a duration of "N/A"
+        raise PreflightError("The file's metadata could not be read")
+
+def _parse(info: dict) -> dict:
+    """Metadata fields from the ffprobe JSON"""
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"
+                  and not s.get("disposition", {}).get("attached_pic")), None)
+    audio = next((s for s in info.get("streams", []) if s.get("codec_type") == "audio"), None)
+    fmt = info.get("format", {})
+    duration = float(fmt.get("duration") or (video or {}).get("duration") or 0)
+
+    return {
+        "duration": round(duration, 2),
+        "format": fmt.get("format_name"),
+        "size_bytes": int(fmt.get("size") or 0),
+        "video": {
+            "codec": video.get("codec_name"),
+            "width": int(video.get("width") or 0),
+            "height": int(video.get("height") or 0),
+            "fps": round(_fps(video.get("avg_frame_rate") or video.get("r_frame_rate")), 3),
+            "frames": int(video.get("nb_frames") or 0)
+        } if video else None,
+        "audio": {
+            "codec": audio.get("codec_name"),
+            "sample_rate": int(audio.get("sample_rate") or 0),
+            "channels": int(audio.get("channels") or 0)
+        } if audio else None
+    }
+
+def preflight(path: str) -> dict:
+    """Validate a video before any analysis work is spent on it.
+
+    Returns the probe metadata plus ``analyze_seconds``, the length the
+    pipeline should process (shorter than ``duration`` when trimmed).
+    Raises PreflightError for files the pipeline can't handle.
+    """
+    meta = probe(path)
+    if meta["video"] is None or not meta["video"]["width"]:
+        raise PreflightError("The file has no video stream")
+    if meta["audio"] is None:
+        raise PreflightError("The video has no audio track to transcribe")
+    if meta["duration"] < MIN_DURATION_SECONDS:
+        raise PreflightError("The video is too short to analyze")
+
+    trimmed = meta["duration"] > MAX_DURATION_SECONDS
+    if trimmed and OVERLENGTH_POLICY == "reject":
+        raise PreflightError(f"Videos longer than {MAX_DURATION_SECONDS / 60:.0f} minutes are not supported")
+
+    meta["trimmed"] = trimmed
+    meta["analyze_seconds"] = min(meta["duration"], MAX_DURATION_SECONDS)
+    return meta
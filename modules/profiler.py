@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+# Profile every job that sends "X-Vocably-Profile: 1", plus this fraction of the rest
+PROFILE_SAMPLE_RATE = float(os.getenv("VOCABLY_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("VOCABLY_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = Path(os.getenv("VOCABLY_PROFILE_DIR", "profiles"))
+
+def should_profile(header: str = None) -> bool:
+    if header and header.strip().lower() in ("1", "true", "yes", "on"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval.
+
+    The result is in the collapsed-stack format used by flamegraph.pl,
+    speedscope and inferno: ``outer;...;inner count`` per line. Time spent in
+    native code (decoders, torch, the LanguageTool HTTP call) appears under
+    the Python frame that called into it. By default the sampled thread is
+    the one that creates the sampler.
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            # ";" separates frames in the output
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="vocably-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def collapsed(self, root: str = None) -> str:
+        prefix = f"{root};" if root else ""
+        return "".join(f"{prefix}{stack} {count}\n" for stack, count in self.counts.most_common())
+
+def profile_path(analysis_id) -> Path:
+    return PROFILE_DIR / f"{analysis_id}.folded"
+
+def save_profile(analysis_id, collapsed: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = profile_path(analysis_id)
+    path.write_text(collapsed)
+    return path
+
+def load_profile(analysis_id) -> str:
+    path = profile_path(analysis_id)
+    return path.read_text() if path.exists() else None
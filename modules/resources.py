@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# How many analyses may run at once in this process, and whether each job's
+# thread is pinned to its cores
+MAX_CONCURRENT_JOBS = int(os.getenv("VOCABLY_MAX_CONCURRENT_JOBS", "1"))
+PIN_CPU_AFFINITY = os.getenv("VOCABLY_PIN_CPU_AFFINITY", "False") == "True"
+
+def available_cores() -> list:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def partition(cores: list, parts: int) -> list:
+    """Split cores into ``parts`` disjoint, near-equal slices (at least one core each)"""
+    parts = max(1, min(parts, len(cores)))
+    size, extra = divmod(len(cores), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+def set_thread_budget(threads: int):
+    """Size the torch and OpenCV thread pools to a job's core budget"""
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def pin_to(cores: list):
+    """Restrict the calling thread (or single-threaded process) to ``cores``"""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+class CoreAllocator:
+    """Gives each concurrent analysis its own slice of the CPU cores.
+
+    Whisper and OpenCV size their thread pools to every core by default, so
+    parallel jobs oversubscribe the machine. The allocator admits at most
+    ``max_jobs`` jobs and hands each a disjoint slice of cores. The torch and
+    cv2 pools are sized to that slice, and the job's thread can optionally be
+    pinned to it. Thread pool sizes are process-wide, so every slot gets the
+    same budget.
+    """
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_JOBS, cores: list = None, pin: bool = PIN_CPU_AFFINITY):
+        self.cores = cores or available_cores()
+        self.slices = partition(self.cores, max_jobs)
+        self.pin = pin
+        self._free = list(range(len(self.slices)))
+        self._active = {}
+        self._lock = threading.Condition()
+
+    @property
+    def threads_per_job(self) -> int:
+        return min(len(s) for s in self.slices)
+
+    @contextmanager
+    def allocate(self, job_id):
+        with self._lock:
+            while not self._free:
+                self._lock.wait()
+            slot = self._free.pop(0)
+            self._active[slot] = {"job": job_id, "cores": self.slices[slot], "since": time.time()}
+        try:
+            set_thread_budget(self.threads_per_job)
+            if self.pin:
+                pin_to(self.slices[slot])
+            yield self._active[slot]
+        finally:
+            if self.pin:
+                pin_to(self.cores)
+            with self._lock:
+                del self._active[slot]
+                self._free.append(slot)
+                self._lock.notify()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "cores": len(self.cores),
+                "max_jobs": len(self.slices),
+                "threads_per_job": self.threads_per_job,
+                "pinned": self.pin,
+                "active": [{"slot": slot, **allocation} for slot, allocation in sorted(self._active.items())]
+            }
@@ -1,10 +1,20 @@
-def generate_scores(analysis: dict, transcript: str, video_analysis: dict = None) -> dict:
+LONG_PAUSE_SECONDS = 3.0
+
+def score_body_language(video_analysis: dict) -> float:
+    eye_contact_score = video_analysis["eye_contact_percentage"]
+    hand_usage_score = min(100, video_analysis["hand_usage_percentage"] * 1.5)
+    expression_score = 90 if video_analysis["dominant_expression"] == "engaging" else 70 if video_analysis["dominant_expression"] == "neutral" else 50
+    return (eye_contact_score + hand_usage_score + expression_score) / 3
+
+def generate_scores(analysis: dict, transcript: str, video_analysis: dict = None, pauses: list = None) -> dict:
     total_words = analysis["total_words"]
+    long_pauses = [p for p in (pauses or []) if p["duration"] >= LONG_PAUSE_SECONDS]
     
     grammar_score = max(0, 100 - (analysis["grammar_errors"] * 5))
     filler_penalty = (analysis["filler_count"] / total_words * 100) * 2 if total_words > 0 else 0
     repetition_penalty = len(analysis["repetitions"]) * 3
-    fluency_score = max(0, 100 - filler_penalty - repetition_penalty)
+    pause_penalty = min(15, len(long_pauses) * 3)
+    fluency_score = max(0, 100 - filler_penalty - repetition_penalty - pause_penalty)
     polite_boost = min(20, analysis["polite_count"] * 4)
     impolite_penalty = analysis["impolite_count"] * 5
     politeness_score = max(0, min(100, 70 + polite_boost - impolite_penalty))
@@ -66,6 +76,8 @@ def generate_scores(analysis: dict, transcript: str, video_analysis: dict = None
             fluency_issues.append(f"• Used {analysis['filler_count']} filler words (um, uh, like, etc.)")
         if analysis["repetitions"]:
             fluency_issues.append(f"• Repeated words: {', '.join(analysis['repetitions'][:3])}")
+        if long_pauses:
+            fluency_issues.append(f"• {len(long_pauses)} long pauses (over {LONG_PAUSE_SECONDS:.0f} seconds)")
         
         detailed_feedback.append({
             "category": "Fluency",
@@ -161,9 +173,7 @@ def generate_scores(analysis: dict, transcript: str, video_analysis: dict = None
     if video_analysis:
         eye_contact_score = video_analysis["eye_contact_percentage"]
         hand_usage_score = min(100, video_analysis["hand_usage_percentage"] * 1.5)
-        expression_score = 90 if video_analysis["dominant_expression"] == "engaging" else 70 if video_analysis["dominant_expression"] == "neutral" else 50
-        
-        body_language_score = (eye_contact_score + hand_usage_score + expression_score) / 3
+        body_language_score = score_body_language(video_analysis)
         
         # Body Language Feedback
         body_issues = []
@@ -245,7 +255,9 @@ def generate_scores(analysis: dict, transcript: str, video_analysis: dict = None
             "total_sentences": analysis["total_sentences"],
             "grammar_errors": analysis["grammar_errors"],
             "filler_words": analysis["filler_count"],
-            "polite_expressions": analysis["polite_count"]
+            "polite_expressions": analysis["polite_count"],
+            "pauses": len(pauses) if pauses is not None else None,
+            "long_pauses": len(long_pauses)
         },
         "video_stats": video_analysis if video_analysis else None
     }
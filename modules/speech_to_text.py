@@ -1,7 +1,55 @@
-import whisper
+import threading
+from modules.asr_backends import load_backend, load_audio
+from modules.vad import detect_speech
+from modules.long_form import LONGFORM_MIN_SECONDS, audio_seconds, transcribe_long_form
 
-model = whisper.load_model("base")
+# The ASR backend (VOCABLY_ASR_BACKEND) is loaded on first use or by the
+# warmup task, so importing this module is cheap
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = load_backend()
+    return _backend
 
 def transcribe_audio(audio_path: str) -> str:
-    result = model.transcribe(audio_path)
-    return result["text"]
+    return transcribe_audio_detailed(audio_path)["text"]
+
+def transcribe_audio_detailed(audio_path: str) -> dict:
+    """Transcribe only the voiced parts of the audio.
+
+    Silence is cut out before the ASR backend runs; segment timestamps are
+    mapped back to the original recording and the pauses found by the VAD are
+    returned for fluency scoring. Recordings of ``LONGFORM_MIN_SECONDS`` or
+    more go through the windowed, parallel long-form path instead.
+    """
+    seconds = audio_seconds(audio_path)
+    if LONGFORM_MIN_SECONDS and seconds is not None and seconds >= LONGFORM_MIN_SECONDS:
+        return transcribe_long_form(audio_path, get_backend)
+
+    backend = get_backend()
+    audio = load_audio(audio_path)
+    timeline = detect_speech(audio)
+
+    if timeline.regions:
+        result = backend.transcribe(timeline.compact(audio))
+    else:
+        result = {"text": "", "segments": []}
+
+    segments = [
+        {"start": timeline.to_original(seg["start"]),
+         "end": timeline.to_original(seg["end"]),
+         "text": seg["text"]}
+        for seg in result["segments"]
+    ]
+
+    return {
+        "text": result["text"],
+        "segments": segments,
+        "pauses": timeline.pauses,
+        "speech_seconds": round(timeline.speech_seconds, 2),
+        "total_seconds": round(timeline.total_seconds, 2)
+    }
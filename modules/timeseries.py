@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from pathlib import Path
+
+# Per-analysis nonverbal samples, one .npy file each (~15 bytes per sample)
+TIMESERIES_DIR = Path(os.getenv("VOCABLY_TIMESERIES_DIR", "timeseries"))
+
+def series_path(analysis_id) -> Path:
+    return TIMESERIES_DIR / f"{analysis_id}.npy"
+
+def save_series(analysis_id, samples) -> Path:
+    """Write a structured sample array; the rename keeps readers from seeing partial files"""
+    TIMESERIES_DIR.mkdir(parents=True, exist_ok=True)
+    path = series_path(analysis_id)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(samples), allow_pickle=False)
+    os.replace(tmp, path)
+    return path
+
+def load_series(analysis_id):
+    """Memory-mapped, read-only view of the stored samples, or None"""
+    path = series_path(analysis_id)
+    if not path.exists():
+        return None
+    return np.load(path, mmap_mode="r", allow_pickle=False)
+
+def timeline(samples, bins: int = 60, movement_pixels: float = None) -> list:
+    """Per-bin averages over equal time slices for charting.
+
+    Face presence and movement are the share of samples in the bin, eye
+    contact and smiles the share of detected faces, as in the summary stats.
+    """
+    if samples is None or len(samples) == 0:
+        return []
+    t = np.asarray(samples["t"], dtype=np.float64)
+    end = float(t[-1]) or 1.0
+    bins = max(1, min(bins, len(samples)))
+    index = np.minimum((t / end * bins).astype(np.intp), bins - 1)
+
+    # Rows weighted by the seconds they cover (adaptive sampling spaces them unevenly)
+    weights = (np.asarray(samples["dt"], dtype=np.float64) if "dt" in samples.dtype.names
+               else np.ones(len(samples)))
+    counts = np.bincount(index, minlength=bins)
+    time = np.bincount(index, weights=weights, minlength=bins)
+    face_time = np.bincount(index, weights=weights * (samples["faces"] > 0), minlength=bins)
+    eye_contact = np.bincount(index, weights=weights * samples["eye_contact"], minlength=bins)
+    smiles = np.bincount(index, weights=weights * samples["smiles"], minlength=bins)
+    motion = np.bincount(index, weights=weights * samples["motion"], minlength=bins)
+    moving = (np.bincount(index, weights=weights * (samples["motion"] > movement_pixels), minlength=bins)
+              if movement_pixels is not None else None)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        face_pct = np.nan_to_num(face_time / time * 100)
+        eye_pct = np.nan_to_num(eye_contact / face_time * 100)
+        smile_pct = np.nan_to_num(smiles / face_time * 100)
+        motion_avg = np.nan_to_num(motion / time)
+        moving_pct = np.nan_to_num(moving / time * 100) if moving is not None else None
+
+    width = end / bins
+    points = []
+    for i in range(bins):
+        if not counts[i]:
+            continue
+        point = {
+            "start": round(i * width, 2),
+            "end": round((i + 1) * width, 2),
+            "samples": int(counts[i]),
+            "face_presence": round(float(face_pct[i]), 1),
+            "eye_contact_percentage": round(float(eye_pct[i]), 1),
+            "smile_percentage": round(float(smile_pct[i]), 1),
+            "motion": round(float(motion_avg[i]))
+        }
+        if moving_pct is not None:
+            point["hand_usage_percentage"] = round(float(moving_pct[i]), 1)
+        points.append(point)
+    return points
@@ -0,0 +1,120 @@
+import numpy as np
+from bisect import bisect_right
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+# Speech must be this far above the estimated noise floor (dB)
+ENERGY_MARGIN_DB = 10.0
+# Frames quieter than this are silence regardless of the noise floor (dBFS)
+MIN_ENERGY_DB = -50.0
+# Unvoiced consonants (s, f, sh) are quiet but have a high zero-crossing rate
+FRICATIVE_ZCR = (0.1, 0.5)
+MIN_SPEECH_MS = 200
+MIN_SILENCE_MS = 300
+PADDING_MS = 150
+# Silence inserted between kept regions so words are not glued together
+JOIN_GAP_SECONDS = 0.2
+
+
+class SpeechTimeline:
+    """Speech regions of a recording and the mapping back from compacted audio"""
+
+    def __init__(self, regions, total_samples, sample_rate=SAMPLE_RATE):
+        self.regions = regions
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+        gap = int(JOIN_GAP_SECONDS * sample_rate)
+        self._compact_starts = []
+        position = 0
+        for start, end in regions:
+            self._compact_starts.append(position)
+            position += (end - start) + gap
+
+    def compact(self, audio: np.ndarray) -> np.ndarray:
+        """Concatenate only the speech regions, separated by short silences"""
+        if not self.regions:
+            return audio[:0]
+        gap = np.zeros(int(JOIN_GAP_SECONDS * self.sample_rate), dtype=audio.dtype)
+        pieces = []
+        for start, end in self.regions:
+            pieces.append(audio[start:end])
+            pieces.append(gap)
+        return np.concatenate(pieces[:-1])
+
+    def to_original(self, seconds: float) -> float:
+        """Map a timestamp in the compacted audio to the original timeline"""
+        if not self.regions:
+            return seconds
+        sample = int(seconds * self.sample_rate)
+        idx = max(0, bisect_right(self._compact_starts, sample) - 1)
+        start, end = self.regions[idx]
+        # Timestamps inside an inserted gap snap to the end of the region
+        offset = min(sample - self._compact_starts[idx], end - start)
+        return round((start + offset) / self.sample_rate, 3)
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(end - start for start, end in self.regions) / self.sample_rate
+
+    @property
+    def total_seconds(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    @property
+    def pauses(self) -> list:
+        """Silences between speech regions (leading/trailing silence excluded)"""
+        return [
+            {"start": round(prev_end / self.sample_rate, 3),
+             "duration": round((start - prev_end) / self.sample_rate, 3)}
+            for (_, prev_end), (start, _) in zip(self.regions, self.regions[1:])
+        ]
+
+
+def _runs(mask: np.ndarray) -> list:
+    """Return [start, end) index pairs of consecutive True values"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> SpeechTimeline:
+    """Energy / zero-crossing voice activity detection on mono float PCM"""
+    frame_len = int(sample_rate * FRAME_MS / 1000)
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return SpeechTimeline([], len(audio), sample_rate)
+
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10
+    energy_db = 20 * np.log10(rms)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+    voiced = energy_db > threshold
+    unvoiced = ((energy_db > max(noise_floor + ENERGY_MARGIN_DB / 2, MIN_ENERGY_DB))
+                & (zcr > FRICATIVE_ZCR[0]) & (zcr < FRICATIVE_ZCR[1]))
+    speech = voiced | unvoiced
+
+    # Bridge short silences, then drop blips too short to be speech
+    min_silence = MIN_SILENCE_MS // FRAME_MS
+    for start, end in _runs(~speech):
+        if end - start < min_silence and start > 0 and end < n_frames:
+            speech[start:end] = True
+    min_speech = MIN_SPEECH_MS // FRAME_MS
+    for start, end in _runs(speech):
+        if end - start < min_speech:
+            speech[start:end] = False
+
+    padding = int(sample_rate * PADDING_MS / 1000)
+    regions = []
+    for start, end in _runs(speech):
+        start = max(0, start * frame_len - padding)
+        end = min(len(audio), end * frame_len + padding)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((int(start), int(end)))
+
+    return SpeechTimeline(regions, len(audio), sample_rate)
@@ -1,102 +1,233 @@
+import os
 import cv2
 import numpy as np
 from collections import Counter
+from functools import lru_cache
+from modules.frame_source import FFmpegGrayFrames, opencv_gray_frames
 
-try:
-    import mediapipe as mp
-    from mediapipe.tasks import python
-    from mediapipe.tasks.python import vision
-    MEDIAPIPE_AVAILABLE = True
-except:
-    MEDIAPIPE_AVAILABLE = False
+@lru_cache(maxsize=1)
+def mediapipe_available() -> bool:
+    # mediapipe is slow to import, so the check runs on first use
+    try:
+        import mediapipe as mp
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+        return True
+    except:
+        return False
 
-def analyze_video_nonverbal(video_path: str) -> dict:
-    if not MEDIAPIPE_AVAILABLE:
-        return {
-            "face_presence": 0,
-            "eye_contact_percentage": 0,
-            "hand_usage_percentage": 0,
-            "hand_movements": 0,
-            "smile_percentage": 0,
-            "dominant_expression": "unknown",
-            "total_frames_analyzed": 0
-        }
-    
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+# "opencv" decodes full frames in-process; "ffmpeg" streams downscaled gray
+# frames from an ffmpeg subprocess at the sampling fps
+FRAME_DECODER = os.getenv("VOCABLY_FRAME_DECODER", "opencv")
+FFMPEG_FRAME_WIDTH = int(os.getenv("VOCABLY_FRAME_WIDTH", "480"))
+
+# Changed pixels between samples that count as significant movement, at the
+# source resolution
+MOVEMENT_PIXELS = 50000
+
+# Frame sampling: "fixed" analyzes every 15th frame; "adaptive" watches cheap
+# low-resolution frame differences and runs the cascades more often while the
+# speaker moves and less often while still, between the min and max interval
+SAMPLING_MODE = os.getenv("VOCABLY_FRAME_SAMPLING", "fixed")
+ADAPTIVE_MIN_INTERVAL = float(os.getenv("VOCABLY_ADAPTIVE_MIN_INTERVAL", "0.2"))
+ADAPTIVE_MAX_INTERVAL = float(os.getenv("VOCABLY_ADAPTIVE_MAX_INTERVAL", "2.0"))
+# Accumulated share of changed low-res pixels that triggers the next analysis
+ADAPTIVE_ACTIVITY_TRIGGER = float(os.getenv("VOCABLY_ADAPTIVE_ACTIVITY", "0.02"))
+ACTIVITY_WIDTH = 160
+# Motion is expressed as changed pixels over this spacing, the fixed stride at 30 fps
+REFERENCE_INTERVAL_SECONDS = 0.5
+
+# One row per analyzed frame: timestamp, faces found, faces with both eyes
+# visible, smiling faces, changed pixels at source resolution, and the
+# seconds of video the row stands for (its weight in the statistics)
+SAMPLE_DTYPE = np.dtype([
+    ("t", "<f4"),
+    ("faces", "u1"),
+    ("eye_contact", "u1"),
+    ("smiles", "u1"),
+    ("motion", "<f4"),
+    ("dt", "<f4"),
+])
+
+def analyze_video_nonverbal(video_path: str, decoder: str = None, metadata: dict = None) -> dict:
+    """Body language statistics from sampled frames.
+
+    ``metadata`` is the preflight probe result. It provides fps and frame
+    size without reopening the file, and ``analyze_seconds`` limits how much
+    of the video is analyzed.
+    """
+    return summarize_nonverbal(analyze_video_samples(video_path, decoder, metadata))
+
+class _Cascades:
+    def __init__(self):
+        # Use Haar Cascade for face detection (simpler, no mediapipe dependency)
+        self.face = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.eye = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        self.smile = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+
+    def detect(self, gray) -> tuple:
+        """(faces, faces with eye contact, smiling faces), each capped at 255"""
+        faces = self.face.detectMultiScale(gray, 1.3, 5)
+        eye_contact = 0
+        smiles = 0
+        
+        for (x, y, w, h) in faces:
+            roi_gray = gray[y:y+h, x:x+w]
+            
+            # Eye detection (proxy for eye contact)
+            eyes = self.eye.detectMultiScale(roi_gray, 1.1, 5)
+            if len(eyes) >= 2:
+                eye_contact += 1
+            
+            # Smile detection
+            if len(self.smile.detectMultiScale(roi_gray, 1.8, 20)) > 0:
+                smiles += 1
+        return min(len(faces), 255), min(eye_contact, 255), min(smiles, 255)
+
+def analyze_video_samples(video_path: str, decoder: str = None, metadata: dict = None, sampling: str = None):
+    """Per-sample nonverbal measurements as a ``SAMPLE_DTYPE`` array.
+
+    Returns None when the vision stack is unavailable.
+    """
+    if not mediapipe_available():
+        return None
     
-    # Sample every 15 frames for performance
-    sample_rate = 15
+    if metadata:
+        fps = metadata["video"]["fps"]
+        source_size = (metadata["video"]["width"], metadata["video"]["height"])
+        max_seconds = metadata["analyze_seconds"] if metadata.get("trimmed") else None
+    else:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        source_size = max_seconds = None
     
-    face_detected_frames = 0
-    eye_contact_frames = 0
-    hand_detected_frames = 0
-    hand_movement_count = 0
-    smile_frames = 0
+    adaptive = (sampling or SAMPLING_MODE) == "adaptive"
+    if adaptive:
+        # Candidate frames arrive at the highest allowed rate; most only get
+        # the cheap activity check
+        sample_rate = max(1, round(fps * ADAPTIVE_MIN_INTERVAL)) if fps > 0 else 1
+    else:
+        # Sample every 15 frames for performance
+        sample_rate = 15
+    seconds_per_sample = sample_rate / fps if fps > 0 else 1.0
     
-    # Use Haar Cascade for face detection (simpler, no mediapipe dependency)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-    smile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+    if (decoder or FRAME_DECODER) == "ffmpeg" and fps > 0:
+        frames = FFmpegGrayFrames(video_path, fps=fps / sample_rate, width=FFMPEG_FRAME_WIDTH,
+                                  source_size=source_size, max_seconds=max_seconds)
+        # Motion is recorded in source pixels so thresholds don't depend on the decoder
+        pixel_scale = 1 / frames.scale_factor
+    else:
+        max_frames = int(max_seconds * fps) if max_seconds and fps > 0 else None
+        frames = opencv_gray_frames(video_path, sample_rate, max_frames)
+        pixel_scale = 1.0
     
+    if adaptive:
+        rows = _adaptive_samples(frames, _Cascades(), seconds_per_sample, pixel_scale)
+    else:
+        rows = _fixed_samples(frames, _Cascades(), seconds_per_sample, pixel_scale)
+    return np.array(rows, dtype=SAMPLE_DTYPE)
+
+def _fixed_samples(frames, cascades: _Cascades, seconds_per_sample: float, pixel_scale: float) -> list:
     prev_frame_gray = None
+    rows = []
     
-    frame_count = 0
-    sampled_frames = 0
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_count % sample_rate != 0:
-            frame_count += 1
-            continue
-        
-        sampled_frames += 1
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Face detection
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        if len(faces) > 0:
-            face_detected_frames += 1
-            
-            for (x, y, w, h) in faces:
-                roi_gray = gray[y:y+h, x:x+w]
-                
-                # Eye detection (proxy for eye contact)
-                eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 5)
-                if len(eyes) >= 2:
-                    eye_contact_frames += 1
-                
-                # Smile detection
-                smiles = smile_cascade.detectMultiScale(roi_gray, 1.8, 20)
-                if len(smiles) > 0:
-                    smile_frames += 1
+    for gray in frames:
+        faces, eye_contact, smiles = cascades.detect(gray)
         
         # Hand/movement detection using frame difference
+        motion = 0.0
         if prev_frame_gray is not None:
             frame_diff = cv2.absdiff(prev_frame_gray, gray)
             _, thresh = cv2.threshold(frame_diff, 30, 255, cv2.THRESH_BINARY)
-            movement_pixels = np.sum(thresh) / 255
-            
-            # Significant movement detected
-            if movement_pixels > 50000:
-                hand_movement_count += 1
-                hand_detected_frames += 1
+            motion = np.sum(thresh) / 255 * pixel_scale
+        
+        rows.append((len(rows) * seconds_per_sample, faces, eye_contact, smiles, motion, seconds_per_sample))
         
-        prev_frame_gray = gray.copy()
-        frame_count += 1
+        # Frame sources keep the previous frame intact for one iteration
+        prev_frame_gray = gray
+    return rows
+
+def _adaptive_samples(frames, cascades: _Cascades, candidate_seconds: float, pixel_scale: float) -> list:
+    """Run the cascades on a candidate frame once enough has changed since the
+    last analyzed one, or the max interval has passed.
+
+    Each row covers the time until the next analyzed frame. Its motion is the
+    mean low-res motion over that stretch, scaled to source pixels over
+    ``REFERENCE_INTERVAL_SECONDS`` so ``MOVEMENT_PIXELS`` keeps its meaning.
+    """
+    motion_scale = REFERENCE_INTERVAL_SECONDS / candidate_seconds
+    rows = []
+    prev_small = None
+    activity = 0.0
+    motions = []
+    t = 0.0
+    
+    for index, gray in enumerate(frames):
+        t = index * candidate_seconds
+        height, width = gray.shape
+        small_width = min(ACTIVITY_WIDTH, width)
+        small = cv2.resize(gray, (small_width, max(1, height * small_width // width)), interpolation=cv2.INTER_AREA)
+        if prev_small is not None:
+            changed = np.count_nonzero(cv2.absdiff(prev_small, small) > 30) / small.size
+            activity += changed
+            motions.append(changed * gray.size * pixel_scale * motion_scale)
+        prev_small = small
+        
+        due = (not rows or activity >= ADAPTIVE_ACTIVITY_TRIGGER
+               or t - rows[-1][0] >= ADAPTIVE_MAX_INTERVAL - 1e-6)
+        if not due:
+            continue
+        if rows:
+            rows[-1][4] = float(np.mean(motions)) if motions else 0.0
+            rows[-1][5] = t - rows[-1][0]
+        rows.append([t, *cascades.detect(gray), 0.0, 0.0])
+        activity = 0.0
+        motions = []
+    
+    if rows:
+        rows[-1][4] = float(np.mean(motions)) if motions else 0.0
+        rows[-1][5] = t + candidate_seconds - rows[-1][0]
+    return [tuple(row) for row in rows]
+
+def summarize_nonverbal(samples, movement_pixels: float = MOVEMENT_PIXELS) -> dict:
+    """Collapse per-sample measurements into the nonverbal statistics.
+
+    Works on in-memory or memory-mapped sample arrays, so metrics can be
+    re-derived with a different movement threshold without decoding again.
+    """
+    if samples is None:
+        return {
+            "face_presence": 0,
+            "eye_contact_percentage": 0,
+            "hand_usage_percentage": 0,
+            "hand_movements": 0,
+            "smile_percentage": 0,
+            "dominant_expression": "unknown",
+            "total_frames_analyzed": 0
+        }
+    
+    sampled_frames = len(samples)
+    # Rows are weighted by the seconds they stand for; files written before
+    # adaptive sampling have no weights and rows at the fixed stride
+    weights = (np.asarray(samples["dt"], dtype=np.float64) if "dt" in samples.dtype.names
+               else np.full(sampled_frames, REFERENCE_INTERVAL_SECONDS))
+    has_face = np.asarray(samples["faces"]) > 0
+    moving = np.asarray(samples["motion"]) > movement_pixels
     
-    cap.release()
+    total_time = float(weights.sum())
+    face_time = float(weights[has_face].sum())
+    eye_contact_time = float((weights * samples["eye_contact"]).sum())
+    smile_time = float((weights * samples["smiles"]).sum())
+    moving_time = float(weights[moving].sum())
+    # Moving time in units of the fixed stride, whichever sampler wrote the rows
+    hand_movement_count = round(moving_time / REFERENCE_INTERVAL_SECONDS)
     
     # Calculate percentages
-    face_presence = (face_detected_frames / sampled_frames * 100) if sampled_frames > 0 else 0
-    eye_contact_pct = (eye_contact_frames / face_detected_frames * 100) if face_detected_frames > 0 else 0
-    hand_usage_pct = (hand_detected_frames / sampled_frames * 100) if sampled_frames > 0 else 0
-    smile_pct = (smile_frames / face_detected_frames * 100) if face_detected_frames > 0 else 0
+    face_presence = (face_time / total_time * 100) if total_time > 0 else 0
+    eye_contact_pct = (eye_contact_time / face_time * 100) if face_time > 0 else 0
+    hand_usage_pct = (moving_time / total_time * 100) if total_time > 0 else 0
+    smile_pct = (smile_time / face_time * 100) if face_time > 0 else 0
     
     # Determine engagement level
     if smile_pct > 30:
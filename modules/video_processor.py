@@ -1,6 +1,10 @@
-from moviepy import VideoFileClip
+# Bytes per second of audio written by extract_audio (16-bit, 16 kHz, mono)
+WAV_BYTES_PER_SECOND = 32000
 
-def extract_audio(video_path: str, audio_path: str):
+def extract_audio(video_path: str, audio_path: str, max_seconds: float = None):
+    from moviepy import VideoFileClip
     video = VideoFileClip(video_path)
-    video.audio.write_audiofile(audio_path, logger=None)
+    audio = video.audio.subclipped(0, max_seconds) if max_seconds else video.audio
+    # 16 kHz mono is what the ASR models consume; ~32 KB per second of audio
+    audio.write_audiofile(audio_path, fps=16000, ffmpeg_params=["-ac", "1"], logger=None)
     video.close()
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Failed components are retried in the background, backing off up to this long
+RETRY_MIN_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+
+_status = {}
+_ready = threading.Event()
+_lock = threading.Lock()
+
+def _import_video_stack():
+    from modules.video_analysis import mediapipe_available
+    import moviepy
+    mediapipe_available()
+
+def _steps():
+    from modules import nlp_engine, speech_to_text
+    return [
+        ("nltk", nlp_engine.ensure_nltk_data),
+        ("languagetool", nlp_engine.get_tool),
+        ("asr", speech_to_text.get_backend),
+        ("video", _import_video_stack),
+    ]
+
+def warm_up():
+    """Import and initialize every heavy analysis dependency.
+
+    Safe to call more than once; components that are already loaded are
+    skipped, so a repeat call only retries the ones in error.
+    """
+    with _lock:
+        for name, step in _steps():
+            if _status.get(name, {}).get("status") == "ready":
+                continue
+            _status[name] = {"status": "loading"}
+            started = time.monotonic()
+            try:
+                step()
+                _status[name] = {"status": "ready", "seconds": round(time.monotonic() - started, 2)}
+            except Exception as e:
+                logger.exception("Warmup of %s failed", name)
+                _status[name] = {"status": "error", "error": str(e)}
+        if all(component["status"] == "ready" for component in _status.values()):
+            _ready.set()
+    return is_ready()
+
+def _warm_up_until_ready():
+    delay = RETRY_MIN_SECONDS
+    while not warm_up():
+        failed = [name for name, component in _status.items() if component["status"] == "error"]
+        logger.warning("Retrying warmup of %s in %.0fs", ", ".join(failed), delay)
+        time.sleep(delay)
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+def start_background_warmup() -> threading.Thread:
+    thread = threading.Thread(target=_warm_up_until_ready, name="vocably-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def readiness() -> dict:
+    return {"ready": is_ready(), "components": dict(_status)}
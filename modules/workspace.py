@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Each job gets its own directory here for the upload and anything it produces
+WORKSPACE_DIR = Path(os.getenv("VOCABLY_WORKSPACE_DIR", "uploads/jobs"))
+# Optional RAM-backed directory (e.g. /dev/shm/vocably) for intermediates such
+# as extracted audio; used while it has room, else they stay in the workspace
+SCRATCH_DIR = os.getenv("VOCABLY_SCRATCH_DIR", "")
+SCRATCH_RESERVE_BYTES = int(os.getenv("VOCABLY_SCRATCH_RESERVE_MB", "256")) * 1024 * 1024
+# Janitor: directories left by dead processes, or older than this, are removed
+MAX_AGE_SECONDS = float(os.getenv("VOCABLY_WORKSPACE_MAX_AGE_SECONDS", "21600"))
+SWEEP_SECONDS = float(os.getenv("VOCABLY_WORKSPACE_SWEEP_SECONDS", "600"))
+
+OWNER_FILE = ".owner"
+HOSTNAME = socket.gethostname()
+
+def safe_suffix(filename: str) -> str:
+    """Lower-cased extension of a client-supplied filename, or '' if it looks odd"""
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ""
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _tree_bytes(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+def _free_bytes(path: Path) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except FileNotFoundError:
+        return 0
+
+class Workspace:
+    """A job's private directories; removed when the ``with`` block exits"""
+
+    def __init__(self, manager: "WorkspaceManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+        self.root = manager.root / job_id
+        self._scratch = None
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def scratch(self, name: str, expected_bytes: int = 0) -> Path:
+        """Path for an intermediate file, on tmpfs when it fits"""
+        if self._scratch is None:
+            self._scratch = self.root
+            scratch_root = self.manager.scratch_root
+            if scratch_root and _free_bytes(scratch_root) >= expected_bytes + SCRATCH_RESERVE_BYTES:
+                self._scratch = scratch_root / self.job_id
+                self.manager._claim(self._scratch)
+        return self._scratch / name
+
+    def disk_usage(self) -> dict:
+        usage = {"workspace_bytes": _tree_bytes(self.root)}
+        if self._scratch is not None and self._scratch != self.root:
+            usage["scratch_bytes"] = _tree_bytes(self._scratch)
+        return usage
+
+    def remove(self):
+        for directory in {self.root, self._scratch or self.root}:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.manager._release(self.job_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.remove()
+        return False
+
+class WorkspaceManager:
+    """Creates per-job workspaces and sweeps up ones orphaned by crashes.
+
+    Every directory carries an owner file (host, pid, creation time). The
+    janitor removes directories whose owning process on this host is gone,
+    and any older than ``MAX_AGE_SECONDS``, skipping this process's live jobs.
+    """
+
+    def __init__(self, root: Path = WORKSPACE_DIR, scratch_root: str = SCRATCH_DIR):
+        self.root = Path(root)
+        self.scratch_root = Path(scratch_root) if scratch_root else None
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.scratch_root:
+            self.scratch_root.mkdir(parents=True, exist_ok=True)
+        self._active = {}
+        self._lock = threading.Lock()
+        self.reclaimed_bytes = 0
+
+    def _claim(self, directory: Path):
+        directory.mkdir(mode=0o700)
+        owner = {"host": HOSTNAME, "pid": os.getpid(), "created": time.time()}
+        (directory / OWNER_FILE).write_text(json.dumps(owner))
+
+    def _release(self, job_id: str):
+        with self._lock:
+            self._active.pop(job_id, None)
+
+    def create(self, job_id: str = None) -> Workspace:
+        workspace = Workspace(self, job_id or uuid.uuid4().hex)
+        # Registered first so a concurrent sweep never sees it unowned
+        with self._lock:
+            self._active[workspace.job_id] = workspace
+        try:
+            self._claim(workspace.root)
+        except Exception:
+            self._release(workspace.job_id)
+            raise
+        return workspace
+
+    def _orphaned(self, directory: Path) -> bool:
+        with self._lock:
+            if directory.name in self._active:
+                return False
+        try:
+            owner = json.loads((directory / OWNER_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            # Claimed a moment ago, or not ours; judge by age
+            return time.time() - directory.stat().st_mtime > MAX_AGE_SECONDS
+        if time.time() - owner["created"] > MAX_AGE_SECONDS:
+            return True
+        if owner["host"] != HOSTNAME:
+            return False
+        return owner["pid"] == os.getpid() or not _pid_alive(owner["pid"])
+
+    def sweep(self) -> dict:
+        removed, reclaimed = 0, 0
+        for base in filter(None, (self.root, self.scratch_root)):
+            for directory in base.iterdir():
+                try:
+                    if not directory.is_dir() or not self._orphaned(directory):
+                        continue
+                except FileNotFoundError:
+                    continue
+                reclaimed += _tree_bytes(directory)
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        with self._lock:
+            self.reclaimed_bytes += reclaimed
+        return {"removed": removed, "reclaimed_bytes": reclaimed}
+
+    def usage(self) -> dict:
+        with self._lock:
+            active = list(self._active.values())
+        totals = {"workspace_bytes": 0, "scratch_bytes": 0}
+        for workspace in active:
+            for key, value in workspace.disk_usage().items():
+                totals[key] += value
+        return {
+            "active_jobs": len(active),
+            **totals,
+            "workspace_free_bytes": _free_bytes(self.root),
+            "scratch_free_bytes": _free_bytes(self.scratch_root) if self.scratch_root else None,
+            "reclaimed_bytes": self.reclaimed_bytes
+        }
+
+    def start_janitor(self) -> threading.Thread:
+        def run():
+            while True:
+                self.sweep()
+                time.sleep(SWEEP_SECONDS)
+
+        thread = threading.Thread(target=run, name="vocably-workspace-janitor", daemon=True)
+        thread.start()
+        return thread